@@ -1,14 +1,34 @@
-from pymongo import DeleteMany, InsertOne, ReplaceOne, UpdateMany
 import streamlit as st
-from init_db import get_collection, initialize_sample_data
-from gemini_utils import generate_mongo_query, explain_query
+from init_db import get_collection
+from bootstrap import ensure_collection_ready
+from schema_catalog import get_collection_schema, get_schema_catalog
+from gemini_utils import generate_mongo_query, explain_query, stream_explanation
+from fast_path import compile_command
+from plan_analyzer import analyze_query
+from index_advisor import advise, get_query_log
+from batch_runner import parse_commands, run_batch, summarize_batch
+from ingest import COLUMN_TYPES, ingest_file, parse_type_hints, preview_types
+from result_cache import cache_key, default_ttl, get_result_cache, is_cacheable, output_collections
 import pandas as pd
 import plotly.express as px
+import os
+import time
 import uuid
 from datetime import datetime
-import json
-from bson import ObjectId
-from mongo_utils import get_mongo_client
+from mongo_utils import get_client_manager
+from transactions import execute_transaction
+from bulk_engine import BULK_CHUNK_SIZE, execute_bulk
+from map_reduce import translate as translate_map_reduce
+from large_charts import line_figure, scatter_figure
+from chart_engine import (AGGREGATES, HISTOGRAM_BINS, can_push_down, category_frame, category_pipeline,
+                          histogram_frame, histogram_pipeline, quantile_pipeline, range_pipeline, value_label)
+from query_cache import get_query_cache, schema_version
+from prompt_compiler import prompt_stats
+from speculative import start_speculative_read
+from result_set import MAX_RESULT_DOCS, PAGE_SIZE, cap_limit, cap_pipeline, open_result_set
+from frame_utils import documents_to_frame, result_frame
+from export_utils import EXPORT_FORMATS, export_query
+from history_store import get_history_store
 
 # Initialize page config
 st.set_page_config(
@@ -116,40 +136,277 @@ def show_query_history():
             return
             
         for idx, entry in enumerate(st.session_state.query_history):
-            col1, col2 = st.columns([3, 1])
+            col1, col2, col3 = st.columns([3, 1, 1])
             with col1:
-                st.caption(f"{entry['timestamp'][11:19]}: {entry['query']}")
+                st.caption(f"{entry['timestamp'][11:19]}: {entry['query']} "
+                           f"({entry['result_summary']}, {entry.get('duration_ms', 0)} ms)")
             with col2:
                 if st.button("↻", key=f"history_btn_{idx}"):
                     st.session_state.current_query = entry['query']
                     st.session_state.explain_mode = False
                     st.rerun()
+            with col3:
+                if st.button("👁", key=f"history_view_{idx}"):
+                    st.session_state.history_open = entry['id']
+        
+        # Result payloads live in the spill store and are only loaded when opened
+        opened = next((e for e in st.session_state.query_history
+                       if e['id'] == st.session_state.get("history_open")), None)
+        if opened:
+            st.caption(f"Result of: {opened['query']}")
+            if opened.get("generated_query"):
+                st.json(opened["generated_query"], expanded=False)
+            result = get_history_store().get(opened["fingerprint"])
+            if result is None:
+                st.info("Result is no longer stored; re-run the command to see it")
+            else:
+                st.json(result, expanded=False)
 
-# --- Visualization Functions ---
-def safe_convert(value):
-    """Convert MongoDB values to Python types safe for DataFrame conversion"""
-    if isinstance(value, ObjectId):
-        return str(value)
-    if isinstance(value, list):
-        return ", ".join(map(str, value))
-    if isinstance(value, dict):
-        return json.dumps(value)
-    return value
+def show_result_browser(result_set):
+    """Page through a find result without loading it all into memory"""
+    try:
+        docs = result_set.fetch()
+        pages, exact = result_set.page_count()
+    except Exception as e:
+        st.error(f"❌ Paging error: {str(e)}")
+        return
+    
+    nav_prev, nav_info, nav_next = st.columns([1, 3, 1])
+    with nav_prev:
+        st.button("◀ Previous", on_click=result_set.previous_page,
+                  disabled=result_set.page == 0, key="page_prev")
+    with nav_info:
+        st.caption(f"Page {result_set.page + 1} of {pages if exact else f'~{pages}'}")
+    with nav_next:
+        st.button("Next ▶", on_click=result_set.next_page,
+                  disabled=not result_set.has_next(), key="page_next")
+    
+    if docs:
+        st.dataframe(documents_to_frame(docs), use_container_width=True)
+    else:
+        st.info("No documents on this page")
+
+def show_export_controls(last_execution):
+    """Export the full result of the last query through a chunked temporary file"""
+    fmt_col, prepare_col = st.columns([2, 1])
+    with fmt_col:
+        fmt = st.selectbox("Export format", list(EXPORT_FORMATS), key="export_format",
+                           label_visibility="collapsed")
+    with prepare_col:
+        prepare = st.button("📦 Prepare", key="export_prepare", use_container_width=True)
+    
+    export_key = (last_execution["id"], fmt)
+    if prepare:
+        with st.spinner("Exporting results..."):
+            try:
+                path, rows = export_query(last_execution["query"], fmt, last_execution["result"])
+            except Exception as e:
+                st.error(f"❌ Export failed: {str(e)}")
+                return
+        previous = st.session_state.get("export_file")
+        if previous and os.path.exists(previous["path"]):
+            os.remove(previous["path"])
+        st.session_state.export_file = {"key": export_key, "path": path, "rows": rows}
+    
+    export_file = st.session_state.get("export_file")
+    if export_file and export_file["key"] == export_key and os.path.exists(export_file["path"]):
+        extension, mime = EXPORT_FORMATS[fmt]
+        with open(export_file["path"], "rb") as handle:
+            st.download_button(
+                f"💾 Download {fmt} ({export_file['rows']} rows)",
+                handle,
+                f"{last_execution['collection']}_results.{extension}",
+                mime,
+                key='download-export'
+            )
+
+def show_index_advisor(collection_name):
+    """Index recommendations mined from executed queries, with one-click builds"""
+    with st.sidebar.expander("🧭 Index Advisor", expanded=False):
+        if st.button("Analyze workload", key="index_advise", use_container_width=True):
+            with st.spinner("Mining executed queries..."):
+                st.session_state.index_report = advise(collection_name)
+        
+        report = st.session_state.get("index_report")
+        if not report or report.get("collection") != collection_name:
+            st.caption("Recommends indexes from the queries executed so far")
+            return
+        if "error" in report:
+            st.error(f"❌ {report['error']}")
+            return
+        
+        st.caption(f"{report['logged_queries']} logged queries on {collection_name}")
+        if not report["recommendations"]:
+            st.info("Existing indexes cover the logged predicates")
+        for idx, rec in enumerate(report["recommendations"]):
+            st.code(str(rec["index"]), language="json")
+            st.caption(f"Serves {rec['queries']} queries ({round(rec['share'] * 100)}%), "
+                       f"{rec['impact']} impact")
+            if st.button("🔨 Build", key=f"index_build_{idx}"):
+                result = execute_advanced_operation({
+                    "operation": "advanced",
+                    "advanced_operation": "create_index",
+                    "collection": collection_name,
+                    "index": rec["index"]
+                })
+                if "error" in result:
+                    st.error(f"❌ {result['error']}")
+                else:
+                    st.success(f"✅ {result['status']}")
+                    st.session_state.index_report = None
+        for index in report["unused_indexes"]:
+            st.warning(f"⚠️ Unused index {index['name']} (no operations since {index['since']})")
+
+def show_batch_mode(collection_name, collection_schema, fast_path_mode):
+    """Run an uploaded list of commands with concurrent generation and grouped execution"""
+    with st.expander("📚 Batch Mode", expanded=False):
+        uploaded = st.file_uploader(
+            "Commands file (one per line, CSV with a 'command' column, or a JSON list)",
+            type=["txt", "csv", "json"],
+            key="batch_file"
+        )
+        if uploaded is not None and st.button("🚀 Run Batch", key="batch_run"):
+            try:
+                commands = parse_commands(uploaded.name, uploaded.getvalue())
+            except ValueError as e:
+                st.error(f"❌ {str(e)}")
+                return
+            if not commands:
+                st.warning("No commands found in the file")
+                return
+            
+            fields = known_fields(collection_name, collection_schema)
+            booleans = boolean_fields(collection_name, collection_schema)
+            version = (collection_schema.version if collection_schema is not None
+                       else schema_version(st.session_state.schema_info.get(collection_name, [])))
+            hint = collection_schema.compact() if collection_schema is not None else ""
+            
+            def compile_local(command):
+                return (compile_command(command, collection_name, fields, booleans)
+                        if fast_path_mode else None)
+            
+            def generate(command):
+                return generate_mongo_query(command, collection_name, version, schema_hint=hint)
+            
+            def validate(query):
+                is_valid, message = validate_query(query)
+                if not is_valid:
+                    return False, message
+                plan = analyze_query(query)
+                if plan and plan.get("verdict") == "refuse":
+                    return False, f"Refused: {plan['message']}"
+                return True, message
+            
+            progress_bar = st.progress(0.0, text="Generating queries...")
+            
+            def progress(stage, done, total):
+                label = "Generating queries" if stage == "generate" else "Executing queries"
+                progress_bar.progress(done / total if total else 1.0, text=f"{label}: {done}/{total}")
+            
+            started = time.perf_counter()
+            entries = run_batch(commands, compile_local, generate, validate, execute_mongo_query, progress)
+            progress_bar.empty()
+            for entry in entries:
+                if entry["status"] == "done":
+                    get_query_log().record(entry["query"])
+            st.session_state.batch_results = {
+                "entries": entries,
+                "duration_ms": round((time.perf_counter() - started) * 1000)
+            }
+        
+        batch = st.session_state.get("batch_results")
+        if not batch:
+            return
+        entries = batch["entries"]
+        done = sum(1 for entry in entries if entry["status"] == "done")
+        st.caption(f"{done}/{len(entries)} commands succeeded in {batch['duration_ms']} ms")
+        st.dataframe(pd.DataFrame(summarize_batch(entries)), hide_index=True, use_container_width=True)
+        
+        viewable = [entry for entry in entries if entry["status"] == "done"]
+        if viewable:
+            picked = st.selectbox(
+                "View result of",
+                viewable,
+                format_func=lambda entry: f"{entry['index'] + 1}. {entry['command']}",
+                key="batch_view"
+            )
+            st.json(picked["query"], expanded=False)
+            if isinstance(picked["result"], list) and picked["result"]:
+                st.dataframe(documents_to_frame(picked["result"]), use_container_width=True)
+            else:
+                st.json(picked["result"])
+
+def show_import_controls(collection_name):
+    """Stream an uploaded CSV/JSON/NDJSON file into a collection in typed batches"""
+    with st.expander("📥 Import Data", expanded=False):
+        uploaded = st.file_uploader(
+            "Data file (CSV, JSON array or NDJSON)",
+            type=["csv", "json", "ndjson", "jsonl"],
+            key="import_file"
+        )
+        target = st.text_input("Target collection", value=collection_name, key="import_collection").strip()
+        hints_text = st.text_area(
+            "Column types (optional)",
+            placeholder="gpa: float\nenrollment_year: int\nnotes: skip",
+            help=f"One 'column: type' per line; types are {', '.join(COLUMN_TYPES)}. "
+                 "Other columns are inferred from the first rows.",
+            key="import_hints"
+        )
+        if uploaded is None:
+            return
+        
+        preview_col, import_col = st.columns(2)
+        with preview_col:
+            if st.button("🔎 Preview Types", key="import_preview", use_container_width=True):
+                try:
+                    uploaded.seek(0)
+                    st.session_state.import_preview = preview_types(uploaded, uploaded.name)
+                except Exception as e:
+                    st.error(f"❌ Could not read file: {str(e)}")
+        with import_col:
+            start_import = st.button("📥 Import", key="import_run", type="primary", use_container_width=True)
+        if st.session_state.get("import_preview"):
+            st.json(st.session_state.import_preview)
+        
+        if start_import:
+            if not target:
+                st.error("❌ Choose a target collection")
+                return
+            try:
+                hints = parse_type_hints(hints_text)
+            except ValueError as e:
+                st.error(f"❌ {str(e)}")
+                return
+            
+            progress_text = st.empty()
+            
+            def progress(stats):
+                progress_text.caption(f"{stats['inserted']:,} inserted of {stats['read']:,} read · "
+                                      f"{stats['docs_per_sec']:,} docs/sec · {stats['batches']} batches")
+            
+            uploaded.seek(0)
+            with st.spinner(f"Importing into {target}..."):
+                result = ingest_file(uploaded, uploaded.name, target, hints, progress)
+            if "error" in result:
+                st.error(f"❌ {result['error']}")
+                return
+            mark_written(target)
+            st.success(f"✅ Imported {result['inserted']:,} documents into {target} "
+                       f"in {result['seconds']} s ({result['docs_per_sec']:,} docs/sec)")
+            if result["failed"] or result["coercion_errors"]:
+                st.warning(f"⚠️ {result['failed']} documents failed, "
+                           f"{result['coercion_errors']} values kept as text")
+            st.json(result, expanded=False)
 
-def visualize_data(data, viz_type):
+# --- Visualization Functions ---
+def visualize_data(data, viz_type, result_id=None):
     if not data or not isinstance(data, list) or len(data) == 0:
         return None
     
+    df = None
     try:
-        # Convert MongoDB data to safe types
-        safe_data = []
-        for doc in data:
-            safe_doc = {}
-            for key, value in doc.items():
-                safe_doc[key] = safe_convert(value)
-            safe_data.append(safe_doc)
-            
-        df = pd.DataFrame(safe_data)
+        # Convert MongoDB data to a typed frame (memoized per result)
+        df = result_frame(result_id, data)
         
         if df.empty:
             return None
@@ -159,7 +416,7 @@ def visualize_data(data, viz_type):
             numeric_cols = df.select_dtypes(include=['number']).columns
             
             if len(numeric_cols) >= 2:
-                return px.scatter(df, x=numeric_cols[0], y=numeric_cols[1], title="Scatter Plot")
+                return scatter_figure(df, numeric_cols[0], numeric_cols[1])
             elif len(df.columns) >= 2:
                 return px.bar(df, x=df.columns[0], y=df.columns[1], title="Bar Chart")
             else:
@@ -181,12 +438,12 @@ def visualize_data(data, viz_type):
         elif viz_type == "Line Chart":
             if len(df.columns) < 2:
                 return df
-            return px.line(df, x=df.columns[0], y=df.columns[1], title="Line Chart")
+            return line_figure(df, df.columns[0], df.columns[1])
         
         elif viz_type == "Scatter Plot":
             if len(df.columns) < 2:
                 return df
-            return px.scatter(df, x=df.columns[0], y=df.columns[1], title="Scatter Plot")
+            return scatter_figure(df, df.columns[0], df.columns[1])
         
         elif viz_type == "Histogram":
             if len(df.columns) < 1:
@@ -198,41 +455,124 @@ def visualize_data(data, viz_type):
         st.error(f"Visualization error: {str(e)}")
         return df  # Fallback to DataFrame
 
+def database_chart(last_execution, viz_type):
+    """Bar, Pie and Histogram aggregated by MongoDB over the query's whole filter; None to chart fetched rows"""
+    if not st.checkbox("Aggregate in database", value=True, key="chart_pushdown",
+                       help="Group or bin every matching document on the server instead of the rows fetched here"):
+        return None
+    query = last_execution["query"]
+    frame = result_frame(last_execution["id"], last_execution["result"])
+    columns = [column for column in frame.columns if column != "_id"]
+    numeric = [column for column in frame.select_dtypes(include=["number"]).columns if column != "_id"]
+    if not columns:
+        return None
+    
+    def run(pipeline):
+        result = execute_mongo_query({"operation": "aggregate", "collection": query["collection"], "pipeline": pipeline})
+        if isinstance(result, dict) and "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+    
+    try:
+        if viz_type == "Histogram":
+            field_col, bins_col, mode_col = st.columns(3)
+            with field_col:
+                x = st.selectbox("Field", numeric or columns, key="chart_hist_x")
+            with bins_col:
+                bins = int(st.number_input("Bins", min_value=2, max_value=200, value=HISTOGRAM_BINS, key="chart_bins"))
+            with mode_col:
+                equal_population = st.checkbox("Equal-population bins", key="chart_quantiles")
+            if x not in numeric:
+                # Non-numeric fields get one bar per value
+                df = category_frame(run(category_pipeline(query, x)), x)
+                return px.bar(df, x=x, y="count", title=f"Histogram of {x}")
+            if equal_population:
+                df = histogram_frame(run(quantile_pipeline(query, x, bins)))
+            else:
+                bounds = run(range_pipeline(query, x))
+                if not bounds:
+                    return None
+                pipeline, boundaries = histogram_pipeline(query, x, bounds[0]["min"], bounds[0]["max"], bins)
+                df = histogram_frame(run(pipeline), boundaries)
+            st.caption(f"{int(df['count'].sum()):,} documents binned in MongoDB")
+            fig = px.bar(df, x="bin", y="count", title=f"Histogram of {x}")
+            fig.update_layout(bargap=0, xaxis_title=x)
+            return fig
+        
+        x_col, agg_col, y_col = st.columns(3)
+        with x_col:
+            x = st.selectbox("Group by", columns, key="chart_group_x")
+        with agg_col:
+            agg = st.selectbox("Aggregate", list(AGGREGATES), key="chart_agg") if numeric else "count"
+        with y_col:
+            y = st.selectbox("Value", numeric, key="chart_value") if agg != "count" else None
+        df = category_frame(run(category_pipeline(query, x, y, agg)), x, y, agg)
+        label = value_label(agg, y)
+        st.caption(f"{len(df)} groups aggregated in MongoDB")
+        if viz_type == "Pie Chart":
+            return px.pie(df, names=x, values=label, title="Pie Chart")
+        return px.bar(df, x=x, y=label, title="Bar Chart")
+    except Exception as e:
+        st.warning(f"⚠️ Database aggregation failed, charting fetched rows instead: {str(e)}")
+        return None
+
 # --- Query Execution ---
+def mark_written(*collection_names):
+    """Stale cached results and schemas after the app writes to collections"""
+    get_result_cache().bump(*collection_names)
+    for name in collection_names:
+        if name:
+            get_schema_catalog().mark_stale(name)
+
 def execute_mongo_query(query: dict):
+    operation = query.get("operation", "").lower()
+    
+    # Bulk and advanced operations resolve their own collections
+    if operation == "bulk":
+        return execute_bulk_operations(query.get("operations", []), query.get("collection"), query.get("ordered"))
+    if operation == "advanced":
+        return execute_advanced_operation(query)
+    
     if "collection" not in query:
         return {"error": "Collection not specified"}
     
+    # Repeated reads are served from the result cache until a write bumps the collection
+    result_cache = get_result_cache()
+    cacheable = is_cacheable(query)
+    if cacheable:
+        key = cache_key(query)
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+        generation = result_cache.generation(query["collection"])
+    
     try:
         collection = get_collection(query["collection"])
         if collection is None:
             return {"error": "Collection not found"}
         
-        operation = query.get("operation", "").lower()
-        
         if operation == "find":
             find_query = query.get("query", {})
             projection = query.get("projection", {"_id": 0})
-            limit = query.get("limit", 100)  # Default limit for safety
+            # Default limit for safety; the result browser pages past MAX_RESULT_DOCS
+            limit = cap_limit(query.get("limit", 100))
             
             cursor = collection.find(find_query, projection)
-            if limit > 0:
-                cursor = cursor.limit(limit)
-            return list(cursor)
-        elif operation == "bulk":
-            return execute_bulk_operations(query.get("operations", []))
-    
-        elif operation == "advanced":
-            return execute_advanced_operation(query)
+            if query.get("sort"):
+                sort = query["sort"]
+                cursor = cursor.sort(list(sort.items()) if isinstance(sort, dict) else sort)
+            result = list(cursor.limit(limit).batch_size(min(limit, PAGE_SIZE * 2)))
         elif operation == "insert":
             # Handle both single and bulk inserts
             if "document" in query:
                 document = query["document"]
                 result = collection.insert_one(document)
+                mark_written(query["collection"])
                 return {"inserted_id": str(result.inserted_id)}
             elif "documents" in query:
                 documents = query["documents"]
                 result = collection.insert_many(documents)
+                mark_written(query["collection"])
                 return {"inserted_ids": [str(id) for id in result.inserted_ids]}
             else:
                 return {"error": "No document(s) provided for insert operation"}
@@ -241,69 +581,52 @@ def execute_mongo_query(query: dict):
             filter_query = query.get("filter", {})
             update_query = query.get("update", {})
             result = collection.update_many(filter_query, update_query)
+            mark_written(query["collection"])
             return {"matched": result.matched_count, "modified": result.modified_count}
         
         elif operation == "delete":
             # Handle both "filter" and "query" parameters
             filter_query = query.get("filter", query.get("query", {}))
             result = collection.delete_many(filter_query)
+            mark_written(query["collection"])
             return {"deleted": result.deleted_count}
         
         elif operation == "aggregate":
-            pipeline = query.get("pipeline", [])
-            return list(collection.aggregate(pipeline))
+            pipeline = cap_pipeline(query.get("pipeline", []))
+            result = list(collection.aggregate(pipeline, batchSize=PAGE_SIZE * 2))
+            if not cacheable:
+                # $out/$merge pipelines write to another collection
+                mark_written(*output_collections(pipeline))
         
         elif operation == "count":
             count_query = query.get("query", {})
-            return {"count": collection.count_documents(count_query)}
+            result = {"count": collection.count_documents(count_query)}
         
         else:
             return {"error": f"Invalid operation: {operation}"}
+        
+        if cacheable:
+            result_cache.put(key, result, default_ttl(query), generation)
+        return result
     
     except Exception as e:
         return {"error": f"Execution error: {str(e)}"}
 
 
-def execute_bulk_operations(operations: list):
-    """Execute bulk write operations"""
+def execute_bulk_operations(operations: list, default_collection=None, ordered=None):
+    """Execute bulk write operations as chunked bulk writes per collection"""
     try:
-        if not operations:
-            return {"error": "No operations provided"}
-            
-        collection_name = operations[0].get("collection")
-        collection = get_collection(collection_name)
-        if collection is None:
-            return {"error": "Collection not found"}
+        progress_bar = st.progress(0.0, text="Writing...") if len(operations) > BULK_CHUNK_SIZE else None
         
-        bulk_ops = []
-        for op in operations:
-            op_type = op["operation"]
-            
-            if op_type == "insert":
-                bulk_ops.append(InsertOne(op["document"]))
-                
-            elif op_type == "update":
-                bulk_ops.append(UpdateMany(
-                    op["filter"],
-                    op["update"]
-                ))
-                
-            elif op_type == "delete":
-                bulk_ops.append(DeleteMany(op["filter"]))
-                
-            elif op_type == "replace":
-                bulk_ops.append(ReplaceOne(
-                    op["filter"],
-                    op["replacement"]
-                ))
-        
-        result = collection.bulk_write(bulk_ops)
-        return {
-            "inserted": result.inserted_count,
-            "modified": result.modified_count,
-            "deleted": result.deleted_count,
-            "upserted": result.upserted_count
-        }
+        def progress(done, total):
+            if progress_bar is not None:
+                progress_bar.progress(done / total, text=f"Written {done}/{total} operations")
+        
+        result = execute_bulk(operations, default_collection, ordered, progress)
+        if progress_bar is not None:
+            progress_bar.empty()
+        mark_written(*result.get("collections", {}))
+        return result
     
     except Exception as e:
         return {"error": f"Bulk operation failed: {str(e)}"}
@@ -311,17 +634,24 @@ def execute_bulk_operations(operations: list):
 def execute_advanced_operation(query: dict):
     """Execute advanced MongoDB operations"""
     try:
+        operation = query.get("advanced_operation", query["operation"])
+        
+        # Transactions span collections; each operation names its own
+        if operation == "transaction":
+            result = execute_transaction(query.get("operations", []), query.get("collection"))
+            if "error" not in result:
+                mark_written(*result["collections"])
+            return result
+        
         collection = get_collection(query["collection"])
         if collection is None:
             return {"error": "Collection not found"}
         
-        operation = query["operation"]
-        
         if operation == "text_search":
             return list(collection.find(
                 {"$text": {"$search": query["search_term"]}},
                 {"score": {"$meta": "textScore"}}
-            ).sort([("score", {"$meta": "textScore"})]))
+            ).sort([("score", {"$meta": "textScore"})]).limit(MAX_RESULT_DOCS))
         
         elif operation == "geospatial":
             return list(collection.find({
@@ -334,15 +664,7 @@ def execute_advanced_operation(query: dict):
                         "$maxDistance": query.get("max_distance", 1000)
                     }
                 }
-            }))
-        
-        elif operation == "transaction":
-            with get_mongo_client().start_session() as session:
-                with session.start_transaction():
-                    results = []
-                    for op in query["operations"]:
-                        results.append(execute_mongo_query(op))
-                    return results
+            }).limit(MAX_RESULT_DOCS))
         
         elif operation == "create_index":
             index_spec = query["index"]
@@ -350,13 +672,12 @@ def execute_advanced_operation(query: dict):
             return {"status": f"Index created: {index_spec}"}
         
         elif operation == "map_reduce":
-            result = collection.map_reduce(
-                query["map"],
-                query["reduce"],
-                query.get("out", "results"),
-                query.get("query", {})
-            )
-            return list(result.find())
+            # Server-side JavaScript map-reduce is deprecated; run the equivalent $group inline
+            try:
+                pipeline = translate_map_reduce(query)
+            except (KeyError, ValueError) as e:
+                return {"error": f"Cannot translate map_reduce: {str(e)}"}
+            return list(collection.aggregate(cap_pipeline(pipeline), batchSize=PAGE_SIZE * 2))
         
         else:
             return {"error": f"Unsupported advanced operation: {operation}"}
@@ -369,6 +690,12 @@ def validate_query(query: dict) -> tuple:
     """Validate MongoDB query structure"""
     required_keys = ["collection", "operation"]
     
+    # Bulk and transaction operations may name the collection per operation instead
+    operations = query.get("operations")
+    if (query.get("operation") in ("bulk", "advanced") and isinstance(operations, list) and operations
+            and all(isinstance(op, dict) and "collection" in op for op in operations)):
+        required_keys = ["operation"]
+    
     # Check required keys
     if not all(key in query for key in required_keys):
         return False, "Missing required keys (collection or operation)"
@@ -403,15 +730,30 @@ def validate_query(query: dict) -> tuple:
     
     return True, "Valid query"
 
+def known_fields(collection_name, collection_schema):
+    """Field names per collection for the local compiler, preferring the inferred schema"""
+    fields = dict(st.session_state.schema_info)
+    if collection_schema is not None:
+        fields[collection_name] = collection_schema.field_names()
+    return fields
+
+def boolean_fields(collection_name, collection_schema):
+    """Fields the inferred schema has only seen holding booleans"""
+    return {collection_name: collection_schema.boolean_fields()} if collection_schema is not None else {}
+
 # --- Query History Management ---
-def save_query_to_history(query, result):
+def save_query_to_history(query, result, generated_query=None, duration_ms=None):
+    """Keep compact metadata in the session; spill the result payload to disk"""
     try:
         history_entry = {
             "id": str(uuid.uuid4()),
             "timestamp": datetime.now().isoformat(),
             "query": query,
+            "generated_query": generated_query,
+            "duration_ms": duration_ms,
+            "row_count": len(result) if isinstance(result, list) else None,
             "result_summary": f"{len(result)} items" if isinstance(result, list) else "Operation",
-            "result": result
+            "fingerprint": get_history_store().put(result)
         }
         st.session_state.query_history.insert(0, history_entry)
         
@@ -438,15 +780,21 @@ def main():
     
     # Initialize MongoDB
     collection_name = collection_selector()
-    if not initialize_sample_data(collection_name):
+    if not ensure_collection_ready(collection_name):
         st.error("Failed to initialize sample data. Check database connection.")
+    collection_schema = get_collection_schema(collection_name)
     
     # Sidebar controls
     with st.sidebar:
         st.header("⚙️ Configuration")
         
         with st.expander("📋 Database Schema", expanded=False):
-            if collection_name in st.session_state.schema_info:
+            if collection_schema is not None:
+                st.write(f"**Collection:** `{collection_name}`")
+                st.dataframe(pd.DataFrame(collection_schema.summary()), hide_index=True, use_container_width=True)
+                st.caption(f"Inferred from {collection_schema.sampled} sampled documents "
+                           f"(~{collection_schema.total_estimate} total), version {collection_schema.version}")
+            elif collection_name in st.session_state.schema_info:
                 st.write(f"**Collection:** `{collection_name}`")
                 st.write("**Fields:**")
                 for field in st.session_state.schema_info[collection_name]:
@@ -455,8 +803,24 @@ def main():
                 st.info("No schema info available")
         
         st.session_state.explain_mode = st.checkbox("Explain queries before execution", value=True)
+        speculative_mode = st.checkbox(
+            "Run read queries while explaining",
+            value=True,
+            help="Starts side-effect-free reads during the explanation; results appear only after you confirm"
+        )
+        stream_mode = st.checkbox(
+            "Stream model responses",
+            value=True,
+            help="Show explanations as they are written and parse queries as soon as they are complete"
+        )
+        fast_path_mode = st.checkbox(
+            "Compile simple commands locally",
+            value=True,
+            help="Filters, counts, deletes and group-by averages that match a fixed grammar skip the model"
+        )
         debug_mode = st.checkbox("Enable Debug Mode", value=False)
         show_query_history()
+        show_index_advisor(collection_name)
         
         st.divider()
         st.info("💡 **Tips & Examples:**")
@@ -485,20 +849,35 @@ def main():
         execute_btn = st.button("🚀 Execute Command", type="primary", use_container_width=True)
     with col2:
         st.caption("💡 Tip: Be specific - mention field names and values")
-
-    # Variable to store execution result
-    execution_result = None
-    query_executed = False
+    
+    show_batch_mode(collection_name, collection_schema, fast_path_mode)
+    show_import_controls(collection_name)
 
     if execute_btn and user_input:
         st.session_state.current_query = user_input
-        query_executed = True
+        st.session_state.last_execution = None
+        started = time.perf_counter()
         
         # Step 1: Generate query
         with st.status("🔍 Generating database query...", expanded=True) as status:
             st.write("Processing your natural language command...")
+            mongo_query = None
+            if fast_path_mode:
+                mongo_query = compile_command(user_input, collection_name,
+                                              known_fields(collection_name, collection_schema),
+                                              boolean_fields(collection_name, collection_schema))
+                if mongo_query is not None:
+                    st.write("⚡ Compiled locally without calling the model")
             try:
-                mongo_query = generate_mongo_query(user_input, collection_name)
+                if mongo_query is None:
+                    mongo_query = generate_mongo_query(
+                        user_input,
+                        collection_name,
+                        collection_schema.version if collection_schema is not None
+                        else schema_version(st.session_state.schema_info.get(collection_name, [])),
+                        stream=stream_mode,
+                        schema_hint=collection_schema.compact() if collection_schema is not None else ""
+                    )
             except Exception as e:
                 st.error(f"❌ Generation Error: {str(e)}")
                 status.update(label="Query generation failed", state="error")
@@ -519,24 +898,46 @@ def main():
                 status.update(label="Query validation failed", state="error")
                 return
             
-            # Step 2: Explain query
+            # Step 2: Check the query plan before anything runs
+            plan = analyze_query(mongo_query, execution_stats=debug_mode)
+            if plan is not None:
+                if "error" in plan:
+                    st.warning(f"⚠️ Plan check skipped: {plan['error']}")
+                elif plan["verdict"] == "refuse":
+                    st.error(f"🛑 Query refused: {plan['message']}. Add a more selective filter or an index.")
+                    status.update(label="Query refused", state="error")
+                    return
+                elif plan["verdict"] == "warn":
+                    st.warning(f"⚠️ {plan['message']}")
+            
+            # Step 3: Explain query (reads may start speculatively meanwhile)
+            speculative_read = None
             if st.session_state.explain_mode:
+                if speculative_mode:
+                    speculative_read = start_speculative_read(execute_mongo_query, mongo_query)
                 st.subheader("Explanation")
                 try:
-                    explanation = explain_query(mongo_query)
-                    st.write(explanation)
+                    if stream_mode:
+                        st.write_stream(stream_explanation(mongo_query))
+                    else:
+                        explanation = explain_query(mongo_query)
+                        st.write(explanation)
                 except Exception as e:
                     st.warning(f"Explanation failed: {str(e)}")
                 
                 if not st.checkbox("✅ Execute this query?", value=True):
+                    if speculative_read is not None:
+                        speculative_read.cancel()
                     status.update(label="Query ready", state="complete")
-                    query_executed = False
                     return
             
-            # Step 3: Execute query
+            # Step 4: Execute query
             st.write("Executing query against database...")
             try:
-                execution_result = execute_mongo_query(mongo_query)
+                if speculative_read is not None:
+                    execution_result = speculative_read.result()
+                else:
+                    execution_result = execute_mongo_query(mongo_query)
             except Exception as e:
                 st.error(f"❌ Execution Error: {str(e)}")
                 status.update(label="Execution failed", state="error")
@@ -547,51 +948,68 @@ def main():
                 status.update(label="Execution failed", state="error")
                 return
             
-            # Step 4: Handle results
+            # Step 5: Handle results
             status.update(label="✅ Operation completed!", state="complete", expanded=False)
             st.success("Command executed successfully")
             
-            # Save to history
-            save_query_to_history(user_input, execution_result)
+            # Save to history and the workload log the index advisor mines
+            get_query_log().record(mongo_query)
+            save_query_to_history(
+                user_input,
+                execution_result,
+                generated_query=mongo_query,
+                duration_ms=round((time.perf_counter() - started) * 1000)
+            )
+            
+            # Keep the result across reruns so paging and view changes don't discard it
+            st.session_state.last_execution = {
+                "id": str(uuid.uuid4()),
+                "collection": mongo_query.get("collection", collection_name),
+                "command": user_input,
+                "query": mongo_query,
+                "result": execution_result,
+                "result_set": open_result_set(mongo_query),
+                "plan": plan
+            }
 
     # Display results OUTSIDE the status container
-    if query_executed and execution_result:
+    last_execution = st.session_state.get("last_execution")
+    if last_execution and last_execution["result"]:
+        execution_result = last_execution["result"]
+        result_collection = last_execution["collection"]
         st.subheader("📊 Results")
         
         # Add export option
         if isinstance(execution_result, list) and execution_result:
             export_col1, export_col2 = st.columns(2)
             with export_col1:
-                # Convert to safe types for CSV export
-                safe_data = []
-                for doc in execution_result:
-                    safe_doc = {}
-                    for key, value in doc.items():
-                        safe_doc[key] = safe_convert(value)
-                    safe_data.append(safe_doc)
-                    
-                csv = pd.DataFrame(safe_data).to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    "💾 Export as CSV",
-                    csv,
-                    f"{collection_name}_results.csv",
-                    "text/csv",
-                    key='download-csv'
-                )
+                show_export_controls(last_execution)
             with export_col2:
                 st.session_state.visualization_type = visualization_selector()
         
         # Visualize results
         if isinstance(execution_result, list) and execution_result:
-            viz_result = visualize_data(execution_result, st.session_state.visualization_type)
-            
-            if viz_result is not None:
-                if isinstance(viz_result, pd.DataFrame):
-                    st.dataframe(viz_result, use_container_width=True)
-                else:
-                    st.plotly_chart(viz_result, use_container_width=True)
+            result_set = last_execution.get("result_set")
+            if result_set is not None and st.session_state.visualization_type == "Table":
+                show_result_browser(result_set)
             else:
-                st.info("No data to visualize")
+                viz_result = None
+                if can_push_down(last_execution["query"], st.session_state.visualization_type):
+                    viz_result = database_chart(last_execution, st.session_state.visualization_type)
+                if viz_result is None:
+                    viz_result = visualize_data(
+                        execution_result,
+                        st.session_state.visualization_type,
+                        result_id=last_execution["id"]
+                    )
+                
+                if viz_result is not None:
+                    if isinstance(viz_result, pd.DataFrame):
+                        st.dataframe(viz_result, use_container_width=True)
+                    else:
+                        st.plotly_chart(viz_result, use_container_width=True)
+                else:
+                    st.info("No data to visualize")
             
             # Show raw data in expander (now outside status container)
             with st.expander("🔍 Raw Data"):
@@ -604,11 +1022,25 @@ def main():
             with st.expander("🚧 Debug Information"):
                 st.subheader("Execution Details")
                 st.json({
-                    "collection": collection_name,
-                    "query": user_input,
+                    "collection": result_collection,
+                    "query": last_execution["command"],
                     "result_type": type(execution_result).__name__,
                     "result_size": len(execution_result) if isinstance(execution_result, list) else 1
                 })
+                if last_execution.get("plan"):
+                    st.subheader("Query Plan")
+                    st.json(last_execution["plan"])
+                st.subheader("Query Cache")
+                st.json(get_query_cache().stats())
+                st.subheader("Result Cache")
+                st.json(get_result_cache().stats())
+                st.subheader("Prompt Sizes")
+                st.json(prompt_stats.snapshot())
+                st.subheader("Connection Pool")
+                try:
+                    st.json(get_client_manager().stats())
+                except Exception as e:
+                    st.warning(f"Pool metrics unavailable: {str(e)}")
 
 if __name__ == "__main__":
     main()  
@@ -0,0 +1,243 @@
+import os
+import io
+import csv
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import streamlit as st
+from speculative import is_side_effect_free, with_script_context
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+BATCH_MAX_COMMANDS = int(os.getenv("BATCH_MAX_COMMANDS", "200"))
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+BULK_COMPATIBLE = {"insert", "update", "delete"}
+
+
+class RateLimiter:
+    """Token bucket shared by the batch workers so bursts stay inside the Gemini quota"""
+
+    def __init__(self, per_minute: int, burst: int = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, min(per_minute, BATCH_WORKERS))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+@st.cache_resource(show_spinner=False)
+def get_rate_limiter():
+    """One limiter per process: every session draws on the same API key"""
+    return RateLimiter(GEMINI_REQUESTS_PER_MINUTE)
+
+
+def parse_commands(filename: str, data: bytes) -> list:
+    """Commands from an uploaded file: one per line, a CSV `command` column, or a JSON list"""
+    text = data.decode("utf-8-sig")
+    if filename.lower().endswith(".json"):
+        commands = json.loads(text)
+        if not isinstance(commands, list):
+            raise ValueError("JSON batch files must contain a list of commands")
+        commands = [str(c.get("command", "")) if isinstance(c, dict) else str(c) for c in commands]
+    elif filename.lower().endswith(".csv"):
+        rows = list(csv.reader(io.StringIO(text)))
+        header = [cell.strip().lower() for cell in rows[0]] if rows else []
+        column = header.index("command") if "command" in header else 0
+        commands = [row[column] for row in rows[1 if "command" in header else 0:] if len(row) > column]
+    else:
+        commands = [line for line in text.splitlines() if not line.lstrip().startswith("#")]
+    commands = [c.strip() for c in commands if c.strip()]
+    if len(commands) > BATCH_MAX_COMMANDS:
+        raise ValueError(f"Batch has {len(commands)} commands; the limit is {BATCH_MAX_COMMANDS}")
+    return commands
+
+
+def _generate(entry, compile_local, generate, limiter):
+    started = time.perf_counter()
+    try:
+        query = compile_local(entry["command"])
+        if query is None:
+            limiter.acquire()
+            query = generate(entry["command"])
+        if "error" in query:
+            entry.update(status="failed", error=query["error"])
+        else:
+            entry.update(status="generated", query=query)
+    except Exception as e:
+        entry.update(status="failed", error=f"Generation error: {str(e)}")
+    entry["generate_ms"] = round((time.perf_counter() - started) * 1000)
+    return entry
+
+
+def _bulk_key(query: dict):
+    """Writes that can share a bulk_write: single-collection insert/update/delete"""
+    operation = query.get("operation")
+    if operation not in BULK_COMPATIBLE or not query.get("collection"):
+        return None
+    if operation == "insert" and "document" not in query and "documents" not in query:
+        return None
+    return query["collection"]
+
+
+def _bulk_operations(query: dict) -> list:
+    if query["operation"] == "insert" and "documents" in query:
+        return [{"operation": "insert", "collection": query["collection"], "document": doc}
+                for doc in query["documents"]]
+    return [query]
+
+
+def plan_phases(entries: list) -> list:
+    """Split validated commands into phases that keep their relative order.
+
+    Consecutive reads form one parallel phase, consecutive bulk-compatible
+    writes to one collection form one bulk phase, anything else runs alone.
+    """
+    phases = []
+    for entry in entries:
+        query = entry["query"]
+        if is_side_effect_free(query):
+            kind, key = "reads", None
+        elif _bulk_key(query):
+            kind, key = "bulk", _bulk_key(query)
+        else:
+            kind, key = "single", None
+        last = phases[-1] if phases else None
+        if last and kind != "single" and last["kind"] == kind and last["key"] == key:
+            last["entries"].append(entry)
+        else:
+            phases.append({"kind": kind, "key": key, "entries": [entry]})
+    return phases
+
+
+def _timed(execute, query):
+    started = time.perf_counter()
+    try:
+        result = execute(query)
+    except Exception as e:
+        result = {"error": f"Execution error: {str(e)}"}
+    return result, round((time.perf_counter() - started) * 1000)
+
+
+def _finish(entry, result, elapsed_ms):
+    entry["execute_ms"] = elapsed_ms
+    if isinstance(result, dict) and "error" in result:
+        entry.update(status="failed", error=result["error"])
+    else:
+        entry.update(status="done", result=result)
+
+
+def _finish_bulk(entries, spans, result, elapsed_ms):
+    """Give each command of a bulk phase the status of its own operations.
+
+    `spans` holds each entry's [start, end) range of operation indexes.
+    Errors and rejections are matched by index; in an ordered write,
+    operations after the first error never ran and their commands are
+    reported as skipped. Errors without an index apply to every command.
+    """
+    if not isinstance(result, dict) or "errors" not in result:
+        for entry in entries:
+            _finish(entry, result, elapsed_ms)
+        return
+    problems = {}
+    for error in result.get("errors", []):
+        problems.setdefault(error.get("index"), error.get("message"))
+    for rejected in result.get("rejected", []):
+        problems.setdefault(rejected["index"], rejected["reason"])
+    ordered_failure = any(chunk["ordered"] and chunk["status"] != "ok" for chunk in result.get("chunks", []))
+    indexed = [index for index in problems if index is not None]
+    stopped_at = min(indexed) if ordered_failure and indexed else None
+    for entry, (start, end) in zip(entries, spans):
+        entry["execute_ms"] = elapsed_ms
+        own = [problems[index] for index in range(start, end) if index in problems]
+        if None in problems:
+            own.append(problems[None])
+        if own:
+            entry.update(status="failed", error=f"Bulk write failed: {own[0]}")
+        elif stopped_at is not None and start > stopped_at:
+            entry.update(status="skipped", error="Not run: an earlier write in the same bulk failed")
+        else:
+            entry.update(status="done", result=result)
+
+
+def run_batch(commands, compile_local, generate, validate, execute, progress=None,
+              workers: int = BATCH_WORKERS, limiter=None):
+    """Generate, validate and execute a list of commands, reporting each one's status and timing.
+
+    `compile_local` returns a query or None (then `generate` asks the model),
+    `validate` returns (ok, message) and `execute` runs one query dict.
+    `progress(stage, done, total)` is called from the calling thread only.
+    """
+    limiter = limiter or get_rate_limiter()
+    entries = [{"index": i, "command": c, "status": "pending", "query": None, "result": None,
+                "error": None, "generate_ms": None, "execute_ms": None} for i, c in enumerate(commands)]
+    report = progress or (lambda stage, done, total: None)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        task = with_script_context(_generate)
+        futures = [pool.submit(task, entry, compile_local, generate, limiter) for entry in entries]
+        for done, _ in enumerate(as_completed(futures), start=1):
+            report("generate", done, len(entries))
+
+        # Validate everything before running anything
+        runnable = []
+        for entry in entries:
+            if entry["status"] != "generated":
+                continue
+            ok, message = validate(entry["query"])
+            if ok:
+                runnable.append(entry)
+            else:
+                entry.update(status="invalid", error=message)
+
+        executed = 0
+        run_query = with_script_context(_timed)
+        for phase in plan_phases(runnable):
+            if phase["kind"] == "reads":
+                futures = {pool.submit(run_query, execute, e["query"]): e for e in phase["entries"]}
+                for future in as_completed(futures):
+                    _finish(futures[future], *future.result())
+                    executed += 1
+                    report("execute", executed, len(runnable))
+            elif phase["kind"] == "bulk":
+                operations, spans = [], []
+                for entry in phase["entries"]:
+                    entry_operations = _bulk_operations(entry["query"])
+                    spans.append((len(operations), len(operations) + len(entry_operations)))
+                    operations.extend(entry_operations)
+                    entry["batched_with"] = len(phase["entries"])
+                result, elapsed_ms = _timed(execute, {"operation": "bulk", "operations": operations})
+                _finish_bulk(phase["entries"], spans, result, elapsed_ms)
+                executed += len(phase["entries"])
+                report("execute", executed, len(runnable))
+            else:
+                entry = phase["entries"][0]
+                _finish(entry, *_timed(execute, entry["query"]))
+                executed += 1
+                report("execute", executed, len(runnable))
+    return entries
+
+
+def summarize_batch(entries: list) -> list:
+    """Table rows for the per-command report"""
+    return [{
+        "#": entry["index"] + 1,
+        "command": entry["command"],
+        "operation": (entry["query"] or {}).get("operation", ""),
+        "status": entry["status"],
+        "generate_ms": entry["generate_ms"],
+        "execute_ms": entry["execute_ms"],
+        "rows": len(entry["result"]) if isinstance(entry["result"], list) else None,
+        "detail": entry["error"] or (f"bulk of {entry['batched_with']}" if entry.get("batched_with") else "")
+    } for entry in entries]
@@ -0,0 +1,471 @@
+"""Offline benchmarks for query execution, frame conversion, chart rendering and CSV export.
+
+Starts a throwaway mongod on a free port with a temporary dbpath (or uses
+--uri), loads synthetic collections shaped like the init_db samples and
+times the app's own entry points at each size. Run from the repository root:
+
+    python benchmarks/app_benchmark.py run [--sizes 1000,10000,100000,1000000] [--baseline OLD.json]
+    python benchmarks/app_benchmark.py compare OLD.json NEW.json
+
+Results go to benchmarks/results/<commit>.json. Reads run with the result
+cache disabled so every repeat reaches MongoDB.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import platform
+import functools
+import subprocess
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DATABASE = "app_benchmark"
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+SCRATCH_DOCS = 1000
+LOAD_BATCH = 10000
+CHART_TYPES = ("Auto", "Bar Chart", "Pie Chart", "Line Chart", "Scatter Plot", "Histogram")
+
+MAJORS = ["Computer Science", "Data Science", "Business", "Mathematics", "Physics", "Economics"]
+COURSES = ["Data Structures", "Algorithms", "Machine Learning", "Statistics", "Economics", "Management"]
+DEPARTMENTS = [("Computer Science", "CS"), ("Data Science", "DS"), ("Business", "BU"),
+               ("Mathematics", "MA"), ("Physics", "PH"), ("Economics", "EC")]
+TOPICS = ["machine learning", "neural networks", "databases", "statistics", "algorithms", "markets", "optics"]
+GRADES = ["A", "A-", "B+", "B", "B-", "C"]
+FIRST_NAMES = ["Alice", "Bob", "Komal", "Diego", "Mei", "Omar", "Sara", "Ivan", "Lena", "Tariq"]
+LAST_NAMES = ["Johnson", "Smith", "Patel", "Garcia", "Chen", "Haddad", "Kowalski", "Novak", "Okafor"]
+
+
+# --- Throwaway server ---
+class ThrowawayMongod:
+    """A mongod on a free local port with a temporary dbpath, removed on exit"""
+
+    def __init__(self, binary: str):
+        self.binary = binary
+        self.dbpath = None
+        self.process = None
+        self.uri = None
+
+    def __enter__(self):
+        if shutil.which(self.binary) is None:
+            raise SystemExit(f"mongod not found ({self.binary}); install MongoDB or pass --uri")
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        self.dbpath = tempfile.mkdtemp(prefix="app-benchmark-")
+        self.process = subprocess.Popen(
+            [self.binary, "--dbpath", self.dbpath, "--port", str(port), "--bind_ip", "127.0.0.1",
+             "--nounixsocket", "--quiet"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.uri = f"mongodb://127.0.0.1:{port}/?directConnection=true"
+        from pymongo import MongoClient
+        deadline = time.time() + 30
+        while True:
+            client = MongoClient(self.uri, serverSelectionTimeoutMS=500)
+            try:
+                client.admin.command("ping")
+                return self
+            except Exception:
+                if self.process.poll() is not None or time.time() > deadline:
+                    self.__exit__(None, None, None)
+                    raise SystemExit("mongod did not start")
+                time.sleep(0.2)
+            finally:
+                client.close()
+
+    def __exit__(self, *exc):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.dbpath:
+            shutil.rmtree(self.dbpath, ignore_errors=True)
+
+
+def configure_app(uri: str, data_dir: str):
+    """Point the app at the benchmark server and import its entry points.
+
+    Outside `streamlit run`, st.cache_resource builds a new value on every
+    call; a process-wide memo gives the client, caches and stores the same
+    one-per-process lifetime they have in the server.
+    """
+    os.environ.update({
+        "MONGO_URI": uri,
+        "MONGO_DATABASE": DATABASE,
+        "MONGO_HEALTH_INTERVAL": "0",
+        "APP_DATA_DIR": data_dir,
+        "RESULT_CACHE_MAX_BYTES": "0",
+        "RESULT_CACHE_CHANGE_STREAMS": "0"
+    })
+    import streamlit as st
+    cache_resource = st.cache_resource
+    st.cache_resource = lambda *args, **kwargs: functools.lru_cache(maxsize=None)
+    sys.path.insert(0, ROOT)
+    try:
+        import app
+    finally:
+        # Only the app's getters, decorated during the import, need the memo
+        st.cache_resource = cache_resource
+    from export_utils import export_query
+    from frame_utils import documents_to_frame, safe_convert
+    from init_db import REQUIRED_INDEXES
+    from mongo_utils import get_mongo_client
+    return {
+        "execute_mongo_query": app.execute_mongo_query,
+        "execute_bulk_operations": app.execute_bulk_operations,
+        "visualize_data": app.visualize_data,
+        "export_query": export_query,
+        "documents_to_frame": documents_to_frame,
+        "safe_convert": safe_convert,
+        "required_indexes": REQUIRED_INDEXES,
+        "db": get_mongo_client()[DATABASE]
+    }
+
+
+# --- Synthetic data ---
+def _name(rng: random.Random, i: int) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+
+
+def student(rng: random.Random, i: int, scratch: bool = False) -> dict:
+    """A students document; every tenth is a location-only one, as in the samples"""
+    if i % 10 == 9:
+        doc = {"name": _name(rng, i),
+               "location": {"type": "Point",
+                            "coordinates": [-74.0 + rng.uniform(-0.5, 0.5), 40.7 + rng.uniform(-0.5, 0.5)]}}
+    else:
+        doc = {"name": _name(rng, i), "major": rng.choice(MAJORS),
+               "enrollment_year": rng.randint(2015, 2024), "gpa": round(rng.uniform(2.0, 4.0), 2),
+               "salary": rng.randrange(40000, 160000, 500), "courses": rng.sample(COURSES, 2)}
+    if scratch:
+        doc["bench_scratch"] = True
+    return doc
+
+
+def course(rng: random.Random, i: int) -> dict:
+    department = rng.choice(DEPARTMENTS)[1]
+    topic = rng.choice(TOPICS)
+    if i % 2:
+        return {"title": f"{topic.title()} {i}", "description": f"Introduction to {topic} and {rng.choice(TOPICS)}"}
+    return {"title": f"{topic.title()} {i}", "department": department, "credits": rng.randint(1, 5),
+            "instructor": f"Dr. {rng.choice(LAST_NAMES)}"}
+
+
+def enrollment(rng: random.Random, i: int) -> dict:
+    return {"student": _name(rng, i), "course": rng.choice(COURSES), "grade": rng.choice(GRADES),
+            "enrolled_at": datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i)}
+
+
+def load_collections(db, size: int, required_indexes: dict, seed: int = 7):
+    """Drop and refill the sample collections: students and enrollments at `size`, courses at size/10"""
+    rng = random.Random(seed)
+    counts = {"students": (student, size), "enrollments": (enrollment, size), "courses": (course, max(10, size // 10))}
+    for name, (make, count) in counts.items():
+        db.drop_collection(name)
+        for start in range(0, count, LOAD_BATCH):
+            db[name].insert_many([make(rng, i) for i in range(start, min(count, start + LOAD_BATCH))], ordered=False)
+        for keys in required_indexes.get(name, []):
+            db[name].create_index(keys)
+    db.drop_collection("departments")
+    db.departments.insert_many([{"name": name, "code": code, "head": f"Dr. {rng.choice(LAST_NAMES)}"}
+                                for name, code in DEPARTMENTS])
+
+
+# --- Cases ---
+class Case:
+    """One timed call; setup and teardown run outside the timer"""
+
+    def __init__(self, group: str, name: str, run, setup=None, teardown=None, rows=None):
+        self.group = group
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: None)
+        self.teardown = teardown or (lambda payload, result: None)
+        self.rows = rows
+
+
+def _checked(result):
+    if isinstance(result, dict) and "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
+
+def build_cases(app: dict, size: int) -> list:
+    db = app["db"]
+    execute = app["execute_mongo_query"]
+    rng = random.Random(size)
+
+    def query_case(name, query, **kwargs):
+        return Case("execute_mongo_query", name, lambda payload: _checked(execute(payload or query)), **kwargs)
+
+    def scratch(count=SCRATCH_DOCS):
+        return [student(rng, size + i, scratch=True) for i in range(count)]
+
+    def remove_scratch(*_):
+        db.students.delete_many({"bench_scratch": True})
+
+    def insert_scratch():
+        db.students.insert_many(scratch())
+
+    def bulk_operations():
+        operations = [{"operation": "insert", "collection": "students", "document": doc} for doc in scratch()]
+        operations += [{"operation": "update", "collection": "students",
+                        "filter": {"enrollment_year": year}, "update": {"$inc": {"salary": 1}}}
+                       for year in range(2015, 2025)]
+        operations += [{"operation": "delete", "collection": "students", "filter": {"bench_scratch": True, "gpa": {"$lt": 2.5}}}]
+        return operations
+
+    cases = [
+        query_case("find", {"operation": "find", "collection": "students",
+                            "query": {"major": "Data Science", "gpa": {"$gte": 3.0}},
+                            "sort": {"salary": -1}, "limit": 100}),
+        query_case("count", {"operation": "count", "collection": "students",
+                             "query": {"enrollment_year": {"$gte": 2020}}}),
+        query_case("aggregate", {"operation": "aggregate", "collection": "students", "pipeline": [
+            {"$match": {"major": {"$exists": True}}},
+            {"$group": {"_id": "$major", "avg_salary": {"$avg": "$salary"}, "students": {"$sum": 1}}},
+            {"$sort": {"avg_salary": -1}}]}),
+        query_case("insert", None,
+                   setup=lambda: {"operation": "insert", "collection": "students", "documents": scratch()},
+                   teardown=remove_scratch),
+        query_case("update", {"operation": "update", "collection": "students",
+                              "filter": {"major": "Business"}, "update": {"$inc": {"salary": 1}}}),
+        query_case("delete", {"operation": "delete", "collection": "students", "filter": {"bench_scratch": True}},
+                   setup=insert_scratch, teardown=remove_scratch),
+        query_case("bulk", None,
+                   setup=lambda: {"operation": "bulk", "collection": "students", "operations": bulk_operations()},
+                   teardown=remove_scratch),
+        query_case("text_search", {"operation": "advanced", "advanced_operation": "text_search",
+                                   "collection": "courses", "search_term": "machine learning"}),
+        query_case("geospatial", {"operation": "advanced", "advanced_operation": "geospatial",
+                                  "collection": "students", "coordinates": [-74.0059, 40.7128],
+                                  "max_distance": 5000}),
+        query_case("map_reduce", {"operation": "advanced", "advanced_operation": "map_reduce",
+                                  "collection": "students",
+                                  "map": "function() { emit(this.major, this.salary); }",
+                                  "reduce": "function(key, values) { return Array.sum(values); }"}),
+        Case("execute_bulk_operations", "mixed", lambda operations: _checked(app["execute_bulk_operations"](operations)),
+             setup=bulk_operations, teardown=remove_scratch),
+    ]
+
+    # Conversion and charts work on documents already fetched, as they do after a query
+    docs = list(db.students.find({"major": {"$exists": True}},
+                                 {"_id": 1, "enrollment_year": 1, "salary": 1, "gpa": 1, "major": 1, "courses": 1}))
+    rows = len(docs)
+    cases += [
+        Case("convert", "safe_convert", lambda _: [{k: app["safe_convert"](v) for k, v in doc.items()} for doc in docs],
+             rows=rows),
+        Case("convert", "documents_to_frame", lambda _: app["documents_to_frame"](docs), rows=rows),
+    ]
+    chart_docs = [{"enrollment_year": doc["enrollment_year"], "salary": doc["salary"], "gpa": doc["gpa"]}
+                  for doc in docs]
+    for viz_type in CHART_TYPES:
+        cases.append(Case("visualize_data", viz_type,
+                          functools.partial(_render, app["visualize_data"], chart_docs, viz_type), rows=rows))
+
+    export = {"operation": "find", "collection": "students", "query": {}, "projection": {"_id": 0}}
+    cases.append(Case("export", "csv", lambda _: app["export_query"](export, "CSV"),
+                      teardown=lambda payload, result: result and os.remove(result[0]), rows=size))
+    return cases
+
+
+def _render(visualize, docs, viz_type, _):
+    """visualize_data plus the JSON encoding st.plotly_chart sends to the browser"""
+    figure = visualize(docs, viz_type)
+    if hasattr(figure, "to_json"):
+        figure.to_json()
+    return figure
+
+
+# --- Measurement ---
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure(case: Case, repeat: int, warmup: int = 1) -> dict:
+    """Wall time over `repeat` runs, then one traced run for peak Python memory"""
+    timings = []
+    for i in range(warmup + repeat + 1):
+        traced = i == warmup + repeat
+        payload = result = None
+        try:
+            payload = case.setup()
+            if traced:
+                tracemalloc.start()
+            start = time.perf_counter()
+            result = case.run(payload)
+            elapsed = (time.perf_counter() - start) * 1000
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            if traced and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            # Scratch documents and export files go even when the run failed
+            case.teardown(payload, result)
+        if not traced and i >= warmup:
+            timings.append(elapsed)
+    return {
+        "p50_ms": round(_percentile(timings, 50), 3),
+        "p95_ms": round(_percentile(timings, 95), 3),
+        "peak_mib": round(peak / 2 ** 20, 2),
+        "runs": repeat
+    }
+
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def run_suite(app: dict, sizes: list, repeat: int, only=None) -> list:
+    results = []
+    for size in sizes:
+        print(f"Loading {size:,} documents...", file=sys.stderr)
+        load_collections(app["db"], size, app["required_indexes"])
+        for case in build_cases(app, size):
+            key = f"{case.group}/{case.name}"
+            if only and not any(part in key for part in only):
+                continue
+            print(f"  {key}", file=sys.stderr)
+            try:
+                measured = measure(case, repeat)
+            except Exception as e:
+                measured = {"error": str(e)}
+            results.append({"case": key, "size": size, "rows": case.rows, **measured})
+    return results
+
+
+# --- Reporting ---
+def print_table(results: list, metric: str, title: str):
+    sizes = sorted({r["size"] for r in results})
+    cases = list(dict.fromkeys(r["case"] for r in results))
+    lookup = {(r["case"], r["size"]): r for r in results}
+    width = max(len(case) for case in cases) + 2
+    print(f"\n{title}")
+    print(f"{'case':<{width}}" + "".join(f"{size:>12,}" for size in sizes))
+    for case in cases:
+        cells = []
+        for size in sizes:
+            entry = lookup.get((case, size), {})
+            cells.append("error" if "error" in entry else f"{entry[metric]:,.2f}" if metric in entry else "-")
+        print(f"{case:<{width}}" + "".join(f"{cell:>12}" for cell in cells))
+
+
+def print_report(results: list):
+    print_table(results, "p50_ms", "p50 (ms)")
+    print_table(results, "p95_ms", "p95 (ms)")
+    print_table(results, "peak_mib", "peak Python memory (MiB)")
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """p50 change per case and size; returns how many exceed the threshold"""
+    old = {(r["case"], r["size"]): r for r in baseline["results"] if "p50_ms" in r}
+    regressions = 0
+    print(f"\n{baseline['meta'].get('commit') or 'baseline'} -> {current['meta'].get('commit') or 'current'} "
+          f"(p50, regression above +{threshold:.0%})")
+    print(f"{'case':<36}{'size':>10}{'before':>12}{'after':>12}{'change':>10}")
+    for entry in current["results"]:
+        before = old.get((entry["case"], entry["size"]))
+        if before is None or "p50_ms" not in entry:
+            continue
+        change = (entry["p50_ms"] - before["p50_ms"]) / before["p50_ms"] if before["p50_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{entry['case']:<36}{entry['size']:>10,}{before['p50_ms']:>12,.2f}{entry['p50_ms']:>12,.2f}"
+              f"{change:>+10.1%}{flag}")
+    return regressions
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the suite and write a results file")
+    run.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated collection sizes")
+    run.add_argument("--repeat", type=int, default=5, help="timed runs per case and size")
+    run.add_argument("--only", default="", help="comma-separated substrings of case names to run")
+    run.add_argument("--mongod", default=os.getenv("MONGOD_BIN", "mongod"), help="mongod binary")
+    run.add_argument("--uri", help="use this disposable server instead of starting mongod")
+    run.add_argument("--output", help="results file (default benchmarks/results/<commit>.json)")
+    run.add_argument("--baseline", help="results file to compare against")
+    run.add_argument("--threshold", type=float, default=0.2, help="p50 slowdown counted as a regression")
+    diff = commands.add_parser("compare", help="compare two results files")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        sys.exit(1 if compare(_load(args.baseline), _load(args.current), args.threshold) else 0)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    only = [part.strip() for part in args.only.split(",") if part.strip()]
+    data_dir = tempfile.mkdtemp(prefix="app-benchmark-data-")
+    server = app = None
+    try:
+        uri = args.uri
+        if not uri:
+            server = ThrowawayMongod(args.mongod).__enter__()
+            uri = server.uri
+        app = configure_app(uri, data_dir)
+        results = run_suite(app, sizes, args.repeat, only)
+        server_version = app["db"].client.server_info().get("version")
+    finally:
+        # An interrupted or failed run must not leave benchmark data on a --uri server
+        if app is not None:
+            app["db"].client.drop_database(DATABASE)
+        if server is not None:
+            server.__exit__(None, None, None)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    import pandas
+    import plotly
+    import pymongo
+    commit = _git("rev-parse", "--short", "HEAD")
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "mongod": server_version,
+            "pymongo": pymongo.version,
+            "pandas": pandas.__version__,
+            "plotly": plotly.__version__,
+            "sizes": sizes,
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'working-tree'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print_report(results)
+    print(f"\nResults written to {output}")
+    if args.baseline:
+        sys.exit(1 if compare(_load(args.baseline), report, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Parse success rate and latency of generated-query parsing over a response corpus.
+
+Compares the regex cleanup generate_mongo_query used to apply with the
+tolerant parser. Run from the repository root:
+
+    python benchmarks/parse_benchmark.py [--corpus PATH] [--repeat N]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+from bson import json_util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_utils import parse_query_response  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parse_corpus.jsonl")
+
+
+def legacy_parse(query_text: str) -> dict:
+    """The regex chain generate_mongo_query used before the tolerant parser"""
+    query_text = re.sub(r'^```json|```$', '', query_text, flags=re.IGNORECASE).strip()
+    query_text = query_text.replace("'", "\"")
+    query_text = re.sub(r'(\w+):', r'"\1":', query_text)
+    query_text = re.sub(r':\s*([a-zA-Z_][\w]*)', r': "\1"', query_text)
+    return json.loads(query_text)
+
+
+PARSERS = {"legacy_regex": legacy_parse, "tolerant": parse_query_response}
+
+
+def load_corpus(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def as_extended_json(value):
+    """Relaxed Extended JSON form, the one the corpus' expected values are written in"""
+    return json.loads(json_util.dumps(value, json_options=json_util.RELAXED_JSON_OPTIONS))
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(cases: list, parse, repeat: int) -> dict:
+    passed, failures, timings = 0, [], []
+    for case in cases:
+        try:
+            ok = as_extended_json(parse(case["response"])) == case["expected"]
+        except Exception:
+            ok = False
+        if ok:
+            passed += 1
+        else:
+            failures.append(case["name"])
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                parse(case["response"])
+            except Exception:
+                pass
+            timings.append((time.perf_counter() - start) * 1e6)
+    return {
+        "success_rate": passed / len(cases),
+        "passed": passed,
+        "cases": len(cases),
+        "p50_us": round(statistics.median(timings), 1),
+        "p95_us": round(_percentile(timings, 95), 1),
+        "failures": failures
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=200, help="timed parses per case")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    cases = load_corpus(args.corpus)
+    results = {name: run(cases, parse, args.repeat) for name, parse in PARSERS.items()}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'parser':<14} {'success':>9} {'p50 µs':>9} {'p95 µs':>9}")
+    for name, result in results.items():
+        print(f"{name:<14} {result['passed']:>4}/{result['cases']:<4} {result['p50_us']:>9} {result['p95_us']:>9}")
+    for name, result in results.items():
+        if result["failures"]:
+            print(f"\n{name} failed: {', '.join(result['failures'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import threading
+from datetime import datetime, timedelta, timezone
+import streamlit as st
+from pymongo.errors import DuplicateKeyError
+from init_db import REQUIRED_INDEXES, SAMPLE_DATA
+from mongo_utils import get_database_name, get_mongo_client
+
+METADATA_COLLECTION = "_app_metadata"
+BOOTSTRAP_VERSION = 1
+SEED_CLAIM_TIMEOUT = 300  # seconds before another process may retake an unfinished seeding claim
+
+
+def index_name(keys) -> str:
+    """Default MongoDB name for an index key list"""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+class Bootstrapper:
+    """Seeds and indexes each collection once per process, recording completion in MongoDB"""
+
+    def __init__(self):
+        self._ready = set()
+        self._lock = threading.Lock()
+        self.index_builds = {}  # collection -> "building" | "done" | error message
+
+    def ensure(self, collection_name: str, wait: bool = False) -> bool:
+        """Seed a collection and start its index build; usable while the build runs.
+
+        A collection only counts as ready once its indexes are built and
+        recorded; after that this never touches the database. A failed
+        build is retried on the next call. `wait` builds indexes inline.
+        """
+        if collection_name in self._ready:
+            return True
+        with self._lock:
+            if collection_name in self._ready or self.index_builds.get(collection_name) == "building":
+                return True
+            self._bootstrap(collection_name, wait)
+            return True
+
+    def is_ready(self, collection_name: str) -> bool:
+        return collection_name in self._ready
+
+    def _bootstrap(self, collection_name, wait=False):
+        db = get_mongo_client()[get_database_name()]
+        required = [index_name(keys) for keys in REQUIRED_INDEXES.get(collection_name, [])]
+        meta = db[METADATA_COLLECTION].find_one({"_id": collection_name})
+        if (meta and meta.get("version") == BOOTSTRAP_VERSION
+                and set(required) <= set(meta.get("indexes", []))):
+            self._ready.add(collection_name)
+            return
+
+        collection = db[collection_name]
+        if (collection.estimated_document_count() == 0 and SAMPLE_DATA.get(collection_name)
+                and self._claim_seeding(db, collection_name)):
+            self._seed(db, collection_name)
+            st.toast(f"✅ Sample data added to {collection_name}", icon="✅")
+
+        self.index_builds[collection_name] = "building"
+        if wait:
+            self._build_indexes(db, collection_name, required)
+            return
+        # Index builds can take a while on large collections; don't block the page on them
+        threading.Thread(
+            target=self._build_indexes,
+            args=(db, collection_name, required),
+            name=f"bootstrap-{collection_name}",
+            daemon=True
+        ).start()
+
+    @staticmethod
+    def _claim_seeding(db, collection_name) -> bool:
+        """Only one worker process may seed a collection; a stale unfinished claim can be retaken"""
+        now = datetime.now(timezone.utc)
+        try:
+            db[METADATA_COLLECTION].update_one(
+                {"_id": collection_name, "seeded": {"$ne": True},
+                 "$or": [{"seeding_since": {"$exists": False}},
+                         {"seeding_since": {"$lt": now - timedelta(seconds=SEED_CLAIM_TIMEOUT)}}]},
+                {"$set": {"seeding_since": now}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    @staticmethod
+    def _seed(db, collection_name):
+        """Insert the sample documents; seeded is recorded only once they are in"""
+        meta = db[METADATA_COLLECTION]
+        try:
+            db[collection_name].insert_many([dict(doc) for doc in SAMPLE_DATA[collection_name]])
+        except Exception:
+            meta.update_one({"_id": collection_name}, {"$unset": {"seeding_since": ""}})
+            raise
+        meta.update_one({"_id": collection_name},
+                        {"$set": {"seeded": True}, "$unset": {"seeding_since": ""}})
+
+    def _build_indexes(self, db, collection_name, required):
+        try:
+            for keys in REQUIRED_INDEXES.get(collection_name, []):
+                db[collection_name].create_index(keys)
+            db[METADATA_COLLECTION].update_one(
+                {"_id": collection_name},
+                {"$set": {
+                    "version": BOOTSTRAP_VERSION,
+                    "indexes": required,
+                    "initialized_at": datetime.now(timezone.utc)
+                }},
+                upsert=True
+            )
+            self.index_builds[collection_name] = "done"
+            self._ready.add(collection_name)
+        except Exception as e:
+            # Metadata is left unset, so the next process retries the build
+            self.index_builds[collection_name] = f"failed: {str(e)}"
+
+
+@st.cache_resource(show_spinner=False)
+def get_bootstrapper():
+    return Bootstrapper()
+
+
+def ensure_collection_ready(collection_name: str) -> bool:
+    """Once-per-process setup for a collection: sample data, indexes and metadata"""
+    try:
+        return get_bootstrapper().ensure(collection_name)
+    except Exception as e:
+        st.error(f"❌ Data initialization failed: {str(e)}")
+        return False
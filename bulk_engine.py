@@ -0,0 +1,168 @@
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import bson
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from mongo_utils import get_database_name, get_mongo_client
+from speculative import with_script_context
+from transactions import to_write_model
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+BULK_CHUNK_BYTES = int(os.getenv("BULK_CHUNK_BYTES", str(8 * 1024 * 1024)))
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "4"))
+PAYLOAD_KEYS = ("document", "filter", "query", "update", "replacement")
+COUNTERS = ("inserted", "matched", "modified", "deleted", "upserted")
+
+
+def _payload_size(op: dict) -> int:
+    try:
+        return len(bson.encode({key: op[key] for key in PAYLOAD_KEYS if key in op}))
+    except Exception:
+        return 0
+
+
+def partition(operations: list, default_collection=None):
+    """Write models per collection, in order, plus the operations that can't be written"""
+    groups, rejected = OrderedDict(), []
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict):
+            rejected.append({"index": index, "operation": None, "reason": "Operation is not an object"})
+            continue
+        collection_name = op.get("collection") or default_collection
+        if not collection_name:
+            rejected.append({"index": index, "operation": op.get("operation"),
+                             "reason": "Operation does not name a collection"})
+            continue
+        try:
+            model = to_write_model(op)
+        except (KeyError, ValueError) as e:
+            reason = f"Missing {e}" if isinstance(e, KeyError) else str(e)
+            rejected.append({"index": index, "operation": op.get("operation"), "reason": reason})
+            continue
+        groups.setdefault(collection_name, []).append((index, op, model))
+    return groups, rejected
+
+
+def chunk(items: list, max_ops: int = BULK_CHUNK_SIZE, max_bytes: int = BULK_CHUNK_BYTES) -> list:
+    """Split a collection's operations into chunks bounded by count and encoded size"""
+    chunks, current, size = [], [], 0
+    for item in items:
+        item_size = _payload_size(item[1])
+        if current and (len(current) >= max_ops or size + item_size > max_bytes):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(item)
+        size += item_size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def needs_order(items: list) -> bool:
+    """Inserts commute with each other; any update, delete or replace keeps the given order"""
+    return not all(isinstance(model, InsertOne) for _, _, model in items)
+
+
+def _write_chunk(db, collection_name, items, ordered):
+    started = time.perf_counter()
+    counts, errors = dict.fromkeys(COUNTERS, 0), []
+    try:
+        result = db[collection_name].bulk_write([model for _, _, model in items], ordered=ordered)
+        counts.update(inserted=result.inserted_count, matched=result.matched_count,
+                      modified=result.modified_count, deleted=result.deleted_count,
+                      upserted=result.upserted_count)
+    except BulkWriteError as e:
+        details = e.details
+        counts.update(inserted=details.get("nInserted", 0), matched=details.get("nMatched", 0),
+                      modified=details.get("nModified", 0), deleted=details.get("nRemoved", 0),
+                      upserted=details.get("nUpserted", 0))
+        for error in details.get("writeErrors", []):
+            errors.append({"index": items[error["index"]][0], "collection": collection_name,
+                           "code": error.get("code"), "message": error.get("errmsg")})
+        for error in details.get("writeConcernErrors", []):
+            errors.append({"index": None, "collection": collection_name,
+                           "code": error.get("code"), "message": error.get("errmsg")})
+    except Exception as e:
+        errors.append({"index": items[0][0], "collection": collection_name, "code": None,
+                       "message": f"Chunk failed: {str(e)}"})
+    return counts, errors, round((time.perf_counter() - started) * 1000)
+
+
+def execute_bulk(operations: list, default_collection=None, ordered=None, progress=None,
+                 workers: int = BULK_WORKERS):
+    """Run generated write operations as chunked bulk writes, collections in parallel.
+
+    `ordered=None` lets each collection decide: insert-only collections are
+    written unordered and their chunks in parallel; anything else keeps its
+    order and stops at the first failing chunk. `progress(done, total)` is
+    called from the calling thread after every chunk.
+    """
+    if not operations:
+        return {"error": "No operations provided"}
+    groups, rejected = partition(operations, default_collection)
+    total = sum(len(items) for items in groups.values())
+    db = get_mongo_client()[get_database_name()]
+
+    # Ordered collections are queues of chunks; unordered chunks are all ready at once
+    queues, ready = {}, []
+    for name, items in groups.items():
+        is_ordered = needs_order(items) if ordered is None else bool(ordered)
+        chunks = [(name, n, chunk_items, is_ordered) for n, chunk_items in enumerate(chunk(items))]
+        if is_ordered:
+            queues[name] = chunks[1:]
+            ready.append(chunks[0])
+        else:
+            ready.extend(chunks)
+
+    collections = {name: dict.fromkeys(COUNTERS, 0) for name in groups}
+    chunk_reports, errors, done = [], [], 0
+    write = with_script_context(_write_chunk)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk") as pool:
+        pending = {pool.submit(write, db, name, items, is_ordered): (name, n, items, is_ordered)
+                   for name, n, items, is_ordered in ready}
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, n, items, is_ordered = pending.pop(future)
+                counts, chunk_errors, elapsed_ms = future.result()
+                for key, value in counts.items():
+                    collections[name][key] += value
+                errors.extend(chunk_errors)
+                chunk_reports.append({"collection": name, "chunk": n, "operations": len(items),
+                                      "ordered": is_ordered, "ms": elapsed_ms,
+                                      "status": "failed" if chunk_errors else "ok"})
+                done += len(items)
+                if progress:
+                    progress(done, total)
+                if is_ordered and queues.get(name):
+                    if chunk_errors:
+                        # An ordered write stops at its first error; later chunks never run
+                        for _, skipped_n, skipped_items, _ in queues.pop(name):
+                            chunk_reports.append({"collection": name, "chunk": skipped_n,
+                                                  "operations": len(skipped_items), "ordered": True,
+                                                  "ms": 0, "status": "skipped"})
+                    else:
+                        next_name, next_n, next_items, _ = queues[name].pop(0)
+                        pending[pool.submit(write, db, next_name, next_items, True)] = (
+                            next_name, next_n, next_items, True)
+
+    summary = {key: sum(counts[key] for counts in collections.values()) for key in COUNTERS}
+    succeeded = any(summary.values()) or any(report["status"] == "ok" for report in chunk_reports)
+    if errors or rejected:
+        status = "partial" if succeeded else "failed"
+    else:
+        status = "completed"
+    result = {
+        "status": status,
+        **summary,
+        "collections": collections,
+        "chunks": sorted(chunk_reports, key=lambda c: (c["collection"], c["chunk"])),
+        "errors": errors,
+        "rejected": rejected
+    }
+    if status == "failed":
+        first = (errors or rejected)[0]
+        result["error"] = f"Bulk operation failed: {first.get('message') or first.get('reason')}"
+    return result
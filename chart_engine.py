@@ -0,0 +1,93 @@
+import os
+import math
+import pandas as pd
+
+CHART_MAX_CATEGORIES = int(os.getenv("CHART_MAX_CATEGORIES", "50"))
+HISTOGRAM_BINS = int(os.getenv("HISTOGRAM_BINS", "20"))
+PUSHDOWN_CHARTS = {"Bar Chart", "Pie Chart", "Histogram"}
+AGGREGATES = {"count": None, "sum": "$sum", "avg": "$avg", "min": "$min", "max": "$max"}
+
+
+def source_stages(query: dict):
+    """Stages that reproduce a find/count query's documents, or None for anything else.
+
+    Aggregate and map_reduce results are already summarized; regrouping them
+    would chart one bar per summary row, so they keep the fetched-rows chart.
+    """
+    if query.get("operation") in ("find", "count"):
+        filter_doc = query.get("query", {})
+        return [{"$match": filter_doc}] if filter_doc else []
+    return None
+
+
+def can_push_down(query: dict, viz_type: str) -> bool:
+    return viz_type in PUSHDOWN_CHARTS and bool(query.get("collection")) and source_stages(query) is not None
+
+
+def value_label(agg: str, y=None) -> str:
+    return "count" if agg == "count" or not y else f"{agg}({y})"
+
+
+def category_pipeline(query: dict, x: str, y=None, agg: str = "count",
+                      limit: int = CHART_MAX_CATEGORIES) -> list:
+    """One row per x value with the aggregated y, largest first (Bar and Pie)"""
+    accumulator = {"$sum": 1} if agg == "count" or not y else {AGGREGATES[agg]: f"${y}"}
+    return source_stages(query) + [
+        {"$group": {"_id": f"${x}", "value": accumulator}},
+        {"$sort": {"value": -1, "_id": 1}},
+        {"$limit": limit}
+    ]
+
+
+def range_pipeline(query: dict, x: str) -> list:
+    """Numeric min/max of x, needed to lay out equal-width bins"""
+    return source_stages(query) + [
+        {"$match": {x: {"$type": "number"}}},
+        {"$group": {"_id": None, "min": {"$min": f"${x}"}, "max": {"$max": f"${x}"}}}
+    ]
+
+
+def histogram_pipeline(query: dict, x: str, low, high, bins: int = HISTOGRAM_BINS):
+    """Equal-width $bucket counts between low and high, with the bin boundaries used"""
+    if high <= low:
+        bins = 1
+    width = (high - low) / bins
+    # $bucket's top boundary is exclusive, so it sits just past the maximum
+    boundaries = [low + width * i for i in range(bins)] + [math.nextafter(high, math.inf)]
+    return source_stages(query) + [
+        {"$match": {x: {"$type": "number"}}},
+        {"$bucket": {"groupBy": f"${x}", "boundaries": boundaries, "output": {"count": {"$sum": 1}}}}
+    ], boundaries
+
+
+def quantile_pipeline(query: dict, x: str, bins: int = HISTOGRAM_BINS) -> list:
+    """Roughly equal-population bins chosen by the server"""
+    return source_stages(query) + [
+        {"$bucketAuto": {"groupBy": f"${x}", "buckets": bins, "output": {"count": {"$sum": 1}}}}
+    ]
+
+
+def category_frame(docs: list, x: str, y=None, agg: str = "count") -> pd.DataFrame:
+    label = value_label(agg, y)
+    return pd.DataFrame(
+        [{x: str(doc["_id"]) if doc["_id"] is not None else "(missing)", label: doc["value"]} for doc in docs],
+        columns=[x, label]
+    )
+
+
+def _bin_label(low, high) -> str:
+    if isinstance(low, (int, float)) and isinstance(high, (int, float)):
+        return f"{low:g} – {high:g}"
+    return f"{low} – {high}"
+
+
+def histogram_frame(docs: list, boundaries=None) -> pd.DataFrame:
+    """Bin labels and counts from $bucket (empty bins filled in) or $bucketAuto output"""
+    if boundaries is not None:
+        counts = {doc["_id"]: doc["count"] for doc in docs}
+        rows = [{"bin": _bin_label(low, high), "low": low, "count": counts.get(low, 0)}
+                for low, high in zip(boundaries, boundaries[1:])]
+    else:
+        rows = [{"bin": _bin_label(doc["_id"]["min"], doc["_id"]["max"]), "low": doc["_id"]["min"],
+                 "count": doc["count"]} for doc in docs]
+    return pd.DataFrame(rows, columns=["bin", "low", "count"])
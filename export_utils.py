@@ -0,0 +1,188 @@
+import os
+import time
+import tempfile
+from itertools import islice
+import bson
+import pandas as pd
+from bson import json_util
+from init_db import get_collection
+from frame_utils import documents_to_frame
+
+EXPORT_DIR = os.path.join(os.getenv("APP_DATA_DIR", ".app_data"), "exports")
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+EXPORT_MAX_AGE = int(os.getenv("EXPORT_MAX_AGE", "3600"))
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "NDJSON": ("ndjson", "application/x-ndjson"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet")
+}
+
+
+def export_cursor(query: dict, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Server-side cursor over the full result of a find/aggregate query, or None"""
+    operation = str(query.get("operation", "")).lower()
+    if operation not in ("find", "aggregate"):
+        return None
+    collection = get_collection(query["collection"])
+    if collection is None:
+        return None
+    if operation == "find":
+        cursor = collection.find(query.get("query", {}), query.get("projection", {"_id": 0}))
+        if query.get("sort"):
+            sort = query["sort"]
+            cursor = cursor.sort(list(sort.items()) if isinstance(sort, dict) else sort)
+        # Only an explicit limit applies; the interactive default of 100 does not
+        if isinstance(query.get("limit"), int) and query["limit"] > 0:
+            cursor = cursor.limit(query["limit"])
+        return cursor.batch_size(chunk_size)
+    return collection.aggregate(query.get("pipeline", []), allowDiskUse=True, batchSize=chunk_size)
+
+
+def _chunks(docs, chunk_size):
+    docs = iter(docs)
+    while True:
+        chunk = list(islice(docs, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _cleanup_exports():
+    """Remove export files older than EXPORT_MAX_AGE"""
+    cutoff = time.time() - EXPORT_MAX_AGE
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _column_kind(column: pd.Series):
+    """int, float, bool, datetime or string for one chunk's column; None when it is all null"""
+    present = column.dropna()
+    if present.empty:
+        return None
+    if pd.api.types.is_bool_dtype(column) or all(isinstance(v, bool) for v in present):
+        return "bool"
+    if pd.api.types.is_integer_dtype(column):
+        return "int"
+    if pd.api.types.is_float_dtype(column):
+        # Integer columns with gaps arrive as floats
+        return "int" if (present == present.round()).all() else "float"
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return "datetime"
+    return "string"
+
+
+def _merge_kind(current, kind):
+    if current is None or current == kind:
+        return kind
+    if kind is None:
+        return current
+    if {current, kind} == {"int", "float"}:
+        return "float"
+    return "string"
+
+
+def _normalize(frame: pd.DataFrame, kinds: dict) -> pd.DataFrame:
+    """Reindex a chunk to every exported column and cast each to its column-wide kind"""
+    frame = frame.reindex(columns=list(kinds))
+    for name, kind in kinds.items():
+        column = frame[name]
+        if kind == "int":
+            frame[name] = pd.to_numeric(column, errors="coerce").astype("Int64")
+        elif kind == "float":
+            frame[name] = pd.to_numeric(column, errors="coerce").astype("float64")
+        elif kind == "bool":
+            frame[name] = column.astype("boolean")
+        elif kind == "datetime":
+            values = pd.to_datetime(column, errors="coerce", utc=True)
+            frame[name] = values.dt.tz_localize(None)
+        else:
+            frame[name] = column.map(lambda v: v if isinstance(v, str) else str(v), na_action="ignore").astype(object)
+    return frame
+
+
+def _arrow_schema(kinds: dict):
+    import pyarrow as pa
+    types = {"int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(),
+             "datetime": pa.timestamp("us"), "string": pa.string()}
+    return pa.schema([(name, types[kind]) for name, kind in kinds.items()])
+
+
+def _spool(docs, chunk_size, spool):
+    """Write documents to a BSON spool file; returns (rows, column kinds over every chunk)"""
+    rows, kinds = 0, {}
+    for chunk in _chunks(docs, chunk_size):
+        rows += len(chunk)
+        spool.write(b"".join(bson.encode(doc) for doc in chunk))
+        frame = documents_to_frame(chunk)
+        for name in frame.columns:
+            kinds[name] = _merge_kind(kinds.get(name), _column_kind(frame[name]))
+    return rows, {name: kind or "string" for name, kind in kinds.items()}
+
+
+def write_export(docs, fmt: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Write documents to a temporary file chunk by chunk; returns (path, rows).
+
+    NDJSON streams straight through. CSV and Parquet need one header and
+    schema for the whole file, so documents are first spooled to disk as
+    BSON while every column and its type is collected; the second pass
+    writes each chunk with all columns, and columns whose type varies
+    between chunks are written as strings.
+    """
+    extension, _ = EXPORT_FORMATS[fmt]
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _cleanup_exports()
+    fd, path = tempfile.mkstemp(suffix=f".{extension}", dir=EXPORT_DIR)
+    rows = 0
+    writer = None
+    try:
+        mode = {"mode": "wb"} if fmt == "Parquet" else {"mode": "w", "encoding": "utf-8", "newline": ""}
+        with os.fdopen(fd, **mode) as handle:
+            if fmt == "NDJSON":
+                for chunk in _chunks(docs, chunk_size):
+                    rows += len(chunk)
+                    handle.write("\n".join(json_util.dumps(doc) for doc in chunk) + "\n")
+                return path, rows
+            with tempfile.TemporaryFile(dir=EXPORT_DIR) as spool:
+                rows, kinds = _spool(docs, chunk_size, spool)
+                spool.seek(0)
+                if fmt == "Parquet":
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+                    schema = _arrow_schema(kinds)
+                    writer = pq.ParquetWriter(handle, schema, compression="zstd")
+                try:
+                    first = True
+                    for chunk in _chunks(bson.decode_file_iter(spool), chunk_size):
+                        frame = _normalize(documents_to_frame(chunk), kinds)
+                        if fmt == "CSV":
+                            frame.to_csv(handle, index=False, header=first)
+                        else:
+                            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+                        first = False
+                    if first and fmt == "CSV":
+                        pd.DataFrame(columns=list(kinds)).to_csv(handle, index=False)
+                finally:
+                    if writer is not None:
+                        writer.close()
+    except Exception:
+        os.remove(path)
+        raise
+    return path, rows
+
+
+def export_query(query: dict, fmt: str, fallback_docs=None):
+    """Export a query's full result, falling back to already-fetched documents"""
+    cursor = export_cursor(query)
+    if cursor is None:
+        cursor = fallback_docs or []
+    try:
+        return write_export(cursor, fmt)
+    finally:
+        if hasattr(cursor, "close"):
+            cursor.close()
@@ -0,0 +1,211 @@
+import re
+import pyparsing as pp
+
+# Phrases people use for a field that is not literally in the command
+FIELD_ALIASES = {
+    "enrolled": "enrollment_year",
+    "enrollment": "enrollment_year",
+    "year": "enrollment_year",
+    "pay": "salary",
+    "grade point average": "gpa",
+}
+
+COMPARATORS = {
+    ">=": "$gte", "<=": "$lte", "!=": "$ne", ">": "$gt", "<": "$lt", "==": "$eq", "=": "$eq",
+    "at least": "$gte", "at most": "$lte", "no more than": "$lte", "no less than": "$gte",
+    "greater than or equal to": "$gte", "less than or equal to": "$lte",
+    "greater than": "$gt", "more than": "$gt", "higher than": "$gt", "above": "$gt", "over": "$gt",
+    "after": "$gt", "less than": "$lt", "lower than": "$lt", "below": "$lt", "under": "$lt",
+    "before": "$lt", "not": "$ne", "is not": "$ne", "equal to": "$eq", "equals": "$eq",
+    "is": "$eq", "in": "$eq",
+}
+# Words that may follow "is" ("gpa is above 3.5"); a value containing one is a misparse
+COMPARATOR_WORDS = {word for phrase in COMPARATORS if phrase[0].isalpha() and phrase not in ("is", "in")
+                    for word in phrase.split() if word not in ("than", "to", "or", "no")}
+# Words that join or exclude values ("Bob or Alice", "except Komal"); outside the grammar
+CONNECTIVES = ["or", "nor", "but", "except", "excluding", "unless", "other than", "apart from"]
+# Bare values that mean null; {field: None} matches null or missing
+NULL_WORDS = {"null", "none"}
+
+ACCUMULATORS = {
+    "average": "$avg", "avg": "$avg", "mean": "$avg",
+    "total": "$sum", "sum": "$sum",
+    "maximum": "$max", "max": "$max", "highest": "$max",
+    "minimum": "$min", "min": "$min", "lowest": "$min",
+}
+
+
+def _phrases(words):
+    """Caseless keyword alternatives, longest first so multi-word phrases win"""
+    return pp.MatchFirst([
+        pp.Regex(r"\s+".join(map(re.escape, w.split())) + (r"(?!\w)" if w[-1].isalnum() else ""),
+                 flags=re.IGNORECASE).set_parse_action(lambda t, w=w: w)
+        for w in sorted(words, key=len, reverse=True)
+    ])
+
+
+def _build_grammar():
+    number = pp.Regex(r"-?\d+(\.\d+)?").set_parse_action(
+        lambda t: float(t[0]) if "." in t[0] else int(t[0])
+    )
+    quoted = pp.QuotedString('"') | pp.QuotedString("'")
+    AND = pp.CaselessKeyword("and")
+    # "is" may lead another comparator: "gpa is above 3.5", "year is at least 2020"
+    qualified = _phrases([phrase for phrase in COMPARATORS if phrase not in ("is", "is not")])
+    comparator = (pp.Suppress(_phrases(["is"])) + qualified) | _phrases(COMPARATORS)
+    connective = _phrases(CONNECTIVES)
+    stop = AND | comparator | connective | _phrases(["by", "per", "for each", "with", "where", "whose", "having"])
+    word = pp.Word(pp.alphanums + "_.")
+
+    field = pp.OneOrMore(~stop + word).set_parse_action(lambda t: " ".join(t))
+    # A bare value ends at a connective, so "Bob or Alice" fails the parse and falls back to Gemini
+    bare_value = pp.OneOrMore(~AND + ~comparator + ~connective + word).set_parse_action(
+        lambda t: [None] if len(t) == 1 and t[0].lower() in NULL_WORDS else " ".join(t)
+    )
+    value = number | quoted | bare_value
+    condition = pp.Group(field + comparator + value)
+    conditions = pp.delimited_list(condition, delim=AND | ",")
+
+    filler = pp.ZeroOrMore(_phrases(["me", "all", "the", "every"]))
+    collection = word("collection")
+    connector = pp.Optional(_phrases(["with", "where", "whose", "having", "that have", "who have", "that are",
+                                      "who are", "which have", "that", "who"]))
+    filtered = collection + pp.Optional(connector + conditions("conditions"))
+
+    find = (_phrases(["show", "find", "list", "get", "display", "fetch"]) + filler + filtered)("find")
+    count = ((_phrases(["count"]) + filler + filtered)
+             | (_phrases(["how many", "number of"]) + filtered + pp.Optional(_phrases(["are there", "exist"]))))("count")
+    delete = (_phrases(["remove", "delete"]) + filler + collection
+              + connector + conditions("conditions"))("delete")
+
+    accumulator = _phrases(ACCUMULATORS)
+    group_by = _phrases(["by", "per", "for each", "grouped by"])
+    group = (pp.Optional(_phrases(["show", "get", "what is", "calculate", "compute", "find", "list"]))
+             + pp.Optional(_phrases(["the"])) + accumulator("accumulator") + field("measure")
+             + group_by + field("group_field"))("group")
+    group_count = (pp.Optional(_phrases(["show", "get", "what is the"]))
+                   + _phrases(["count of", "number of"]) + collection
+                   + group_by + field("group_field"))("group_count")
+
+    command = (group | group_count | count | delete | find) + pp.Optional(pp.Char("?.!")) + pp.StringEnd()
+    return command
+
+
+GRAMMAR = _build_grammar()
+
+
+def _resolve_field(phrase: str, fields: list):
+    """Map a spoken field phrase onto a known field name, or None"""
+    phrase = phrase.strip().lower()
+    by_name = {f.lower(): f for f in fields}
+    for candidate in (phrase, phrase.replace(" ", "_"), FIELD_ALIASES.get(phrase, "")):
+        if candidate in by_name:
+            return by_name[candidate]
+    # "students gpa" / "the salary": last word(s) may name the field
+    words = phrase.split()
+    for start in range(1, len(words)):
+        tail = "_".join(words[start:])
+        if tail in by_name:
+            return by_name[tail]
+        if FIELD_ALIASES.get(" ".join(words[start:])) in by_name:
+            return by_name[FIELD_ALIASES[" ".join(words[start:])]]
+    return None
+
+
+def _resolve_collection(word: str, collections: dict):
+    word = word.lower()
+    for name in collections:
+        if word in (name, name.rstrip("s"), name + "s"):
+            return name
+    return None
+
+
+def _coerce(value, boolean: bool):
+    """Read "true"/"false" as booleans only for fields the schema knows are boolean"""
+    if boolean and isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    return value
+
+
+def _build_filter(conditions, fields, boolean_fields=(), destructive=False):
+    query = {}
+    for phrase, comparator, value in conditions or []:
+        name = _resolve_field(phrase, fields)
+        if name is None:
+            return None
+        if isinstance(value, str) and COMPARATOR_WORDS & set(value.lower().split()):
+            return None
+        op = COMPARATORS[comparator]
+        if op in ("$gt", "$gte", "$lt", "$lte") and not isinstance(value, (int, float)):
+            return None
+        # A multi-word negation is the likeliest misparse; never delete on one
+        if destructive and op == "$ne" and isinstance(value, str) and len(value.split()) > 1:
+            return None
+        value = _coerce(value, name in boolean_fields)
+        if op == "$eq":
+            if name in query:
+                return None
+            query[name] = value
+        else:
+            existing = query.setdefault(name, {})
+            if not isinstance(existing, dict) or op in existing:
+                return None
+            existing[op] = value
+    return query
+
+
+def compile_command(command: str, collection_name: str, collections: dict, boolean_fields: dict = None):
+    """Compile a simple filter/count/delete/group-by command without the LLM.
+
+    `collections` maps collection names to their known field names and
+    `boolean_fields` to the ones holding booleans; commands that don't name
+    a collection target `collection_name`. Returns a query
+    dict in the format validate_query accepts, or None when the command is
+    outside the grammar or names unknown fields; callers fall back to Gemini.
+    """
+    try:
+        parsed = GRAMMAR.parse_string(command.strip(), parse_all=True)
+    except pp.ParseException:
+        return None
+
+    if "collection" in parsed:
+        collection = _resolve_collection(parsed["collection"], collections)
+    else:
+        collection = collection_name
+    if collection not in collections:
+        return None
+    fields = collections[collection]
+
+    if "group" in parsed or "group_count" in parsed:
+        group_field = _resolve_field(parsed["group_field"], fields)
+        if group_field is None:
+            return None
+        if "group" in parsed:
+            measure = _resolve_field(parsed["measure"], fields)
+            if measure is None:
+                return None
+            label = f"{parsed['accumulator']}_{measure}"
+            accumulator = {ACCUMULATORS[parsed["accumulator"]]: f"${measure}"}
+        else:
+            label, accumulator = "count", {"$sum": 1}
+        return {
+            "operation": "aggregate",
+            "collection": collection,
+            "pipeline": [
+                {"$group": {"_id": f"${group_field}", label: accumulator}},
+                {"$sort": {"_id": 1}}
+            ]
+        }
+
+    query = _build_filter(parsed.get("conditions"), fields, (boolean_fields or {}).get(collection, ()),
+                          destructive="delete" in parsed)
+    if query is None:
+        return None
+    if "delete" in parsed:
+        # Never compile an unfiltered delete locally
+        if not query:
+            return None
+        return {"operation": "delete", "collection": collection, "filter": query}
+    if "count" in parsed:
+        return {"operation": "count", "collection": collection, "query": query}
+    return {"operation": "find", "collection": collection, "query": query}
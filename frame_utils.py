@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+
+FRAME_CACHE_SIZE = 4
+
+
+def safe_convert(value):
+    """Convert MongoDB values to Python types safe for DataFrame conversion"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, list):
+        if any(isinstance(item, dict) for item in value):
+            return json.dumps(value, default=str)
+        return ", ".join(map(str, value))
+    if isinstance(value, dict):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _join_list(value):
+    if any(isinstance(item, dict) for item in value):
+        return json.dumps(value, default=str)
+    return ", ".join(map(str, value))
+
+
+def _convert_column(column: pd.Series) -> pd.Series:
+    """Convert one object column according to the BSON types it holds"""
+    present = column.dropna()
+    if present.empty:
+        return column
+    types = set(present.map(type).unique())
+    if types == {ObjectId}:
+        return column.map(str, na_action="ignore")
+    if types <= {datetime, pd.Timestamp}:
+        return pd.to_datetime(column, errors="coerce")
+    if types == {Decimal128}:
+        return column.map(lambda v: float(v.to_decimal()), na_action="ignore")
+    if types == {list}:
+        return column.map(_join_list, na_action="ignore")
+    if types == {dict}:
+        return column.map(lambda v: json.dumps(v, default=str), na_action="ignore")
+    if types <= {str, bool, int, float}:
+        return column
+    # Mixed BSON types: fall back to per-value conversion for this column only
+    return column.map(safe_convert, na_action="ignore")
+
+
+def documents_to_frame(docs: list) -> pd.DataFrame:
+    """Turn a batch of BSON documents into a flat, typed DataFrame in one pass.
+
+    Nested documents become dotted columns (``address.city``); ObjectId,
+    datetime, Decimal128 and array columns are converted column-wise.
+    """
+    if not docs:
+        return pd.DataFrame()
+    df = pd.json_normalize(docs, sep=".")
+    for name in df.columns[df.dtypes == object]:
+        df[name] = _convert_column(df[name])
+    return df
+
+
+def result_frame(result_id: str, docs: list) -> pd.DataFrame:
+    """documents_to_frame memoized per result id for the current session"""
+    if result_id is None:
+        return documents_to_frame(docs)
+    cache = st.session_state.setdefault("frame_cache", {})
+    if result_id not in cache:
+        cache[result_id] = documents_to_frame(docs)
+        while len(cache) > FRAME_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+    return cache[result_id]
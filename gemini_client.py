@@ -0,0 +1,116 @@
+import os
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+import streamlit as st
+
+load_dotenv()
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+
+
+class GeminiResponseError(Exception):
+    """Raised when Gemini answers with a payload we cannot read text from"""
+
+    def __init__(self, message, response_json=None):
+        super().__init__(message)
+        self.response_json = response_json
+
+
+class RequestProfile:
+    """Pre-serialized static tail of a generateContent payload"""
+
+    def __init__(self, generation_config: dict, safety_settings: list = None):
+        tail = {"generationConfig": generation_config}
+        if safety_settings:
+            tail["safetySettings"] = safety_settings
+        # '{"generationConfig": ...}' -> ', "generationConfig": ...}' so it can follow "contents"
+        self.tail = (", " + json.dumps(tail)[1:]).encode("utf-8")
+
+    def body(self, prompt: str) -> bytes:
+        head = '{"contents": [{"parts": [{"text": ' + json.dumps(prompt) + '}]}]'
+        return head.encode("utf-8") + self.tail
+
+
+class GeminiClient:
+    """Thread-safe Gemini client sharing one keep-alive connection pool per process"""
+
+    def __init__(self, api_key: str, model: str = "gemini-2.0-flash", pool_size: int = 10,
+                 connect_timeout: float = 5.0, read_timeout: float = 30.0):
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._url = f"{GEMINI_BASE_URL}/{model}:generateContent"
+        self._stream_url = f"{GEMINI_BASE_URL}/{model}:streamGenerateContent?alt=sse"
+        self._session = requests.Session()
+        # Retry only failed connects; a generation request may already have been processed
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+        )
+        self._session.mount("https://", adapter)
+        self._session.headers.update({
+            "Content-Type": "application/json",
+            "x-goog-api-key": api_key
+        })
+        self._lock = threading.Lock()
+        self.request_count = 0
+
+    def _post(self, url, body: bytes, timeout=None, **kwargs):
+        with self._lock:
+            self.request_count += 1
+        response = self._session.post(
+            url,
+            data=body,
+            timeout=(self.connect_timeout, timeout or self.read_timeout),
+            **kwargs
+        )
+        response.raise_for_status()
+        return response
+
+    def generate_text(self, prompt: str, profile: RequestProfile, timeout: float = None) -> str:
+        """Run a generateContent call and return the first candidate's text"""
+        response_json = self._post(self._url, profile.body(prompt), timeout).json()
+        if 'candidates' in response_json and response_json['candidates']:
+            return response_json['candidates'][0]['content']['parts'][0]['text']
+        if 'content' in response_json and 'parts' in response_json['content']:
+            return response_json['content']['parts'][0]['text']
+        raise GeminiResponseError("Unexpected API response: " + json.dumps(response_json), response_json)
+
+    def stream_text(self, prompt: str, profile: RequestProfile, timeout: float = None):
+        """Yield text fragments from streamGenerateContent as they arrive"""
+        response = self._post(self._stream_url, profile.body(prompt), timeout, stream=True)
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                chunk = json.loads(line[5:])
+                for candidate in chunk.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
+        finally:
+            # Closing early (e.g. once a full JSON object arrived) drops the rest of the stream
+            response.close()
+
+    def close(self):
+        self._session.close()
+
+
+@st.cache_resource(show_spinner=False)
+def get_gemini_client():
+    """Process-wide Gemini client, or None when no API key is configured"""
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        return None
+    return GeminiClient(
+        api_key,
+        model=os.getenv("GEMINI_MODEL", "gemini-2.0-flash"),
+        pool_size=int(os.getenv("GEMINI_POOL_SIZE", "10")),
+        connect_timeout=float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5")),
+        read_timeout=float(os.getenv("GEMINI_READ_TIMEOUT", "30"))
+    )
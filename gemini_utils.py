@@ -1,184 +1,178 @@
 import os
 import requests
-import json
-import re
-from dotenv import load_dotenv
 import streamlit as st
+from bson import json_util
+from gemini_client import GeminiResponseError, RequestProfile, get_gemini_client
+from prompt_compiler import compile_query_prompt
+from query_cache import get_query_cache
+from tolerant_json import parse_json_text, parse_json_value
 
-load_dotenv()
+STRUCTURED_OUTPUT = os.getenv("GEMINI_STRUCTURED_OUTPUT", "1") == "1"
 
-@st.cache_data(ttl=600, show_spinner=False)
-def generate_mongo_query(user_prompt: str, collection_name: str) -> dict:
-    """Generate MongoDB query from natural language with caching"""
-    API_KEY = os.getenv("GOOGLE_API_KEY")
-    if not API_KEY:
-        return {"error": "API key missing"}
-    
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={API_KEY}"
-    headers = {'Content-Type': 'application/json'}
-    
-    # Enhanced prompt with schema awareness
-    prompt = f"""
-    You are an expert MongoDB developer. Convert this natural language command into a MongoDB query in JSON format.
-
-Collection: {collection_name}
-Important: 
-- For bulk operations, use "bulk" operation with "operations" array
-- For advanced operations, use "advanced" operation with specific parameters
-- Use proper MongoDB syntax for complex queries
-- Support transactions, geospatial queries, text search, etc.
-
-# Advanced Operation Examples:
-
-1. Bulk Insert:
-Command: "Add three new students: Alice (GPA 3.8), Bob (GPA 3.5), Charlie (GPA 3.9)"
-{{
-  "operation": "bulk",
-  "operations": [
-    {{
-      "operation": "insert",
-      "collection": "students",
-      "document": {{"name": "Alice", "gpa": 3.8}}
-    }},
-    {{
-      "operation": "insert",
-      "collection": "students",
-      "document": {{"name": "Bob", "gpa": 3.5}}
-    }},
-    {{
-      "operation": "insert",
-      "collection": "students",
-      "document": {{"name": "Charlie", "gpa": 3.9}}
-    }}
-  ]
-}}
-
-2. Transaction (Update and Delete):
-Command: "Transfer 10000 salary from Alice to Bob and remove Charlie's enrollment"
-{{
-  "operation": "advanced",
-  "advanced_operation": "transaction",
-  "operations": [
-    {{
-      "operation": "update",
-      "collection": "students",
-      "filter": {{"name": "Alice"}},
-      "update": {{"$inc": {{"salary": -10000}}}}
-    }},
-    {{
-      "operation": "update",
-      "collection": "students",
-      "filter": {{"name": "Bob"}},
-      "update": {{"$inc": {{"salary": 10000}}}}
-    }},
-    {{
-      "operation": "delete",
-      "collection": "enrollments",
-      "filter": {{"student": "Charlie"}}
-    }}
-  ]
-}}
-
-3. Text Search:
-Command: "Find courses related to machine learning"
-{{
-  "operation": "advanced",
-  "advanced_operation": "text_search",
-  "collection": "courses",
-  "search_term": "machine learning"
-}}
-
-4. Geospatial Query:
-Command: "Find students within 5km of New York"
-{{
-  "operation": "advanced",
-  "advanced_operation": "geospatial",
-  "collection": "students",
-  "coordinates": [-74.0059, 40.7128],
-  "max_distance": 5000
-}}
-
-5. Map-Reduce:
-Command: "Calculate average GPA by department using map-reduce"
-{{
-  "operation": "advanced",
-  "advanced_operation": "map_reduce",
-  "collection": "students",
-  "map": "function() {{ emit(this.major, this.gpa); }}",
-  "reduce": "function(key, values) {{ return Array.avg(values); }}"
-}}
-
-6. Create Index:
-Command: "Create text index on course titles"
-{{
-  "operation": "advanced",
-  "advanced_operation": "create_index",
-  "collection": "courses",
-  "index": {{"title": "text"}}
-}}
+# Free-form sub-documents travel as JSON strings: Gemini's OBJECT type needs fixed properties
+JSON_STRING_FIELDS = ("query", "projection", "sort", "filter", "update", "document", "documents",
+                      "replacement", "pipeline", "index")
 
-    
-    Command: "{user_prompt}"
-    """
-    
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {
-            "temperature": 0.1,
-            "maxOutputTokens": 1000,
-            "topP": 0.8,
-            "topK": 40
-        },
-        "safetySettings": [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
+
+def _json_string(description):
+    return {"type": "STRING", "description": description}
+
+
+QUERY_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "operation": {"type": "STRING", "format": "enum",
+                      "enum": ["find", "insert", "update", "delete", "aggregate", "count", "bulk", "advanced"]},
+        "advanced_operation": {"type": "STRING", "format": "enum",
+                               "enum": ["transaction", "text_search", "geospatial", "create_index", "map_reduce"]},
+        "collection": {"type": "STRING"},
+        "query": _json_string("find/count/map_reduce filter as a JSON object"),
+        "projection": _json_string("find projection as a JSON object"),
+        "sort": _json_string("sort specification as a JSON object, or a single field name"),
+        "limit": {"type": "INTEGER"},
+        "filter": _json_string("update/delete/replace filter as a JSON object"),
+        "update": _json_string("update document with operators as a JSON object"),
+        "document": _json_string("document to insert as a JSON object"),
+        "documents": _json_string("documents to insert as a JSON array"),
+        "replacement": _json_string("replacement document as a JSON object"),
+        "pipeline": _json_string("aggregation pipeline as a JSON array"),
+        "operations": {"type": "ARRAY", "items": _json_string("one bulk/transaction operation as a JSON object")},
+        "ordered": {"type": "BOOLEAN"},
+        "search_term": {"type": "STRING"},
+        "coordinates": {"type": "ARRAY", "items": {"type": "NUMBER"}},
+        "max_distance": {"type": "NUMBER"},
+        "index": _json_string("index keys as a JSON object, or a single field name"),
+        "map": {"type": "STRING"},
+        "reduce": {"type": "STRING"}
+    },
+    "required": ["operation"],
+    "propertyOrdering": ["operation", "advanced_operation", "collection", "query", "projection", "sort", "limit",
+                         "filter", "update", "document", "documents", "replacement", "pipeline", "operations",
+                         "ordered", "search_term", "coordinates", "max_distance", "index", "map", "reduce"]
+}
+
+STRUCTURED_NOTE = """
+Respond with a single JSON object. Encode query, projection, sort, filter, update, document,
+documents, replacement, pipeline, index and each entry of operations as a JSON string.
+Write ObjectIds as {"$oid": "..."} and dates as {"$date": "2024-01-31T00:00:00Z"}.
+"""
+
+QUERY_GENERATION_CONFIG = {
+    "temperature": 0.1,
+    "maxOutputTokens": 1000,
+    "topP": 0.8,
+    "topK": 40
+}
+if STRUCTURED_OUTPUT:
+    QUERY_GENERATION_CONFIG.update(responseMimeType="application/json", responseSchema=QUERY_RESPONSE_SCHEMA)
+
+QUERY_PROFILE = RequestProfile(
+    generation_config=QUERY_GENERATION_CONFIG,
+    safety_settings=[
+        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
+    ]
+)
+
+EXPLAIN_PROFILE = RequestProfile(generation_config={"temperature": 0.3, "maxOutputTokens": 500})
+
+def generate_mongo_query(user_prompt: str, collection_name: str, schema_version: str = "",
+                         stream: bool = False, schema_hint: str = "") -> dict:
+    """Generate MongoDB query from natural language with persistent caching"""
+    cache = get_query_cache()
+    cached = cache.get(user_prompt, collection_name, schema_version)
+    if cached is not None:
+        return cached
+
+    query = _request_mongo_query(user_prompt, collection_name, stream, schema_hint)
+    if "error" not in query:
+        cache.put(user_prompt, collection_name, query, schema_version)
+    return query
+
+def _first_json_object(fragments) -> str:
+    """Consume streamed text until the first top-level JSON object is complete"""
+    buffer = []
+    depth = 0
+    in_string = escaped = False
+    for fragment in fragments:
+        for char in fragment:
+            if depth == 0 and char != "{":
+                continue
+            buffer.append(char)
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    # Stop reading; closing the generator drops the trailing tokens
+                    fragments.close()
+                    return "".join(buffer)
+    return "".join(buffer)
+
+def unpack_query(query: dict) -> dict:
+    """Decode sub-documents sent as JSON strings; objects and bare names such as "index": "name" are kept"""
+    for field in JSON_STRING_FIELDS:
+        value = query.get(field)
+        if isinstance(value, str):
+            if not value.strip():
+                del query[field]
+            elif value.lstrip()[0] in "{[":
+                query[field] = parse_json_value(value)
+    if isinstance(query.get("operations"), list):
+        query["operations"] = [
+            unpack_query(parse_json_value(op) if isinstance(op, str) else op) for op in query["operations"]
         ]
-    }
+    return query
+
+def parse_query_response(text: str) -> dict:
+    """Model output (structured or free-form) to a query dict"""
+    query = parse_json_text(text)
+    if not isinstance(query, dict):
+        raise ValueError("Response is not a JSON object")
+    return unpack_query(query)
+
+def _request_mongo_query(user_prompt: str, collection_name: str, stream: bool = False,
+                         schema_hint: str = "") -> dict:
+    """Ask Gemini to translate a command into a MongoDB query"""
+    client = get_gemini_client()
+    if client is None:
+        return {"error": "API key missing"}
     
+    prompt = compile_query_prompt(user_prompt, collection_name, schema_hint)
+    if STRUCTURED_OUTPUT:
+        prompt += STRUCTURED_NOTE
+    
+    query_text = ""
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        response_json = response.json()
-        
-        # Extract text response
-        if 'candidates' in response_json and response_json['candidates']:
-            query_text = response_json['candidates'][0]['content']['parts'][0]['text']
-        elif 'content' in response_json and 'parts' in response_json['content']:
-            query_text = response_json['content']['parts'][0]['text']
+        if stream:
+            query_text = _first_json_object(client.stream_text(prompt, QUERY_PROFILE, timeout=30))
         else:
-            return {"error": "Unexpected API response: " + json.dumps(response_json)}
-        
-        # Clean and parse JSON
-        query_text = re.sub(r'^```json|```$', '', query_text, flags=re.IGNORECASE).strip()
+            query_text = client.generate_text(prompt, QUERY_PROFILE, timeout=30)
         
-        # Fix common JSON formatting issues
-        query_text = query_text.replace("'", "\"")  # Replace single quotes
-        query_text = re.sub(r'(\w+):', r'"\1":', query_text)  # Add quotes to keys
-        query_text = re.sub(r':\s*([a-zA-Z_][\w]*)', r': "\1"', query_text)  # Add quotes to unquoted string values
-        
-        return json.loads(query_text)
+        return parse_query_response(query_text)
     
+    except GeminiResponseError as e:
+        return {"error": str(e)}
     except requests.exceptions.RequestException as e:
         return {"error": f"Network error: {str(e)}"}
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         return {"error": f"JSON parsing error: {str(e)} in: {query_text}"}
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
-@st.cache_data(ttl=600, show_spinner=False)
-def explain_query(query):
-    """Explain MongoDB query in simple terms with caching"""
-    API_KEY = os.getenv("GOOGLE_API_KEY")
-    if not API_KEY:
-        return "API key missing"
-    
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={API_KEY}"
-    headers = {'Content-Type': 'application/json'}
-    
-    # Enhanced explanation prompt
-    prompt = f"""
+def _explain_prompt(query) -> str:
+    return f"""
     Explain this MongoDB query in simple terms for a non-technical user:
     1. Describe the operation being performed
     2. Explain the filter criteria (if any)
@@ -186,22 +180,31 @@ def explain_query(query):
     4. Mention which collection is being accessed
     
     Query:
-    {json.dumps(query, indent=2)}
+    {json_util.dumps(query, indent=2)}
     """
-    
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {"temperature": 0.3, "maxOutputTokens": 500}
-    }
+
+@st.cache_data(ttl=600, show_spinner=False)
+def explain_query(query):
+    """Explain MongoDB query in simple terms with caching"""
+    client = get_gemini_client()
+    if client is None:
+        return "API key missing"
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=20)
-        response.raise_for_status()
-        response_json = response.json()
-        
-        if 'candidates' in response_json and response_json['candidates']:
-            return response_json['candidates'][0]['content']['parts'][0]['text']
+        return client.generate_text(_explain_prompt(query), EXPLAIN_PROFILE, timeout=20)
+    except GeminiResponseError:
         return "Failed to generate explanation"
+    except Exception as e:
+        return f"Explanation service unavailable: {str(e)}"
+
+def stream_explanation(query):
+    """Yield the explanation of a MongoDB query incrementally"""
+    client = get_gemini_client()
+    if client is None:
+        yield "API key missing"
+        return
     
+    try:
+        yield from client.stream_text(_explain_prompt(query), EXPLAIN_PROFILE, timeout=20)
     except Exception as e:
-        return f"Explanation service unavailable: {str(e)}"
\ No newline at end of file
+        yield f"\n\nExplanation service unavailable: {str(e)}"
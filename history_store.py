@@ -0,0 +1,106 @@
+import os
+import zlib
+import atexit
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from bson import json_util
+import streamlit as st
+
+
+def _pid_alive(pid: int) -> bool:
+    """Whether a process with this pid is running; assumed alive where it can't be probed"""
+    if os.name == "nt":
+        # os.kill terminates the process on Windows instead of probing it
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def remove_stale_spills(root: str):
+    """Delete spill directories left behind by processes that are no longer running"""
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    for name in names:
+        if name.isdigit() and int(name) != os.getpid() and not _pid_alive(int(name)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+class ResultSpillStore:
+    """Compressed on-disk store for history results under a per-process byte budget"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()  # fingerprint -> compressed size, oldest first
+        self._total = 0
+        self._lock = threading.Lock()
+        # Files from a previous run of this pid are stale; start empty
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+
+    def _path(self, fingerprint):
+        return os.path.join(self.directory, f"{fingerprint}.json.z")
+
+    def put(self, result) -> str:
+        """Spill a result payload; returns its fingerprint"""
+        payload = json_util.dumps(result).encode("utf-8")
+        fingerprint = hashlib.sha1(payload).hexdigest()[:16]
+        with self._lock:
+            if fingerprint in self._index:
+                self._index.move_to_end(fingerprint)
+                return fingerprint
+            data = zlib.compress(payload, 6)
+            if len(data) > self.max_bytes:
+                return fingerprint
+            with open(self._path(fingerprint), "wb") as handle:
+                handle.write(data)
+            self._index[fingerprint] = len(data)
+            self._total += len(data)
+            while self._total > self.max_bytes:
+                evicted, size = self._index.popitem(last=False)
+                self._total -= size
+                try:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+        return fingerprint
+
+    def get(self, fingerprint: str):
+        """Reload a spilled result, or None if it has been evicted"""
+        with self._lock:
+            if fingerprint not in self._index:
+                return None
+            self._index.move_to_end(fingerprint)
+            with open(self._path(fingerprint), "rb") as handle:
+                data = handle.read()
+        return json_util.loads(zlib.decompress(data).decode("utf-8"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._index), "bytes": self._total, "budget": self.max_bytes}
+
+
+@st.cache_resource(show_spinner=False)
+def get_history_store():
+    """Process-wide spill store for query history results.
+
+    Each process spills into history/<pid>, removed at exit; directories of
+    processes that died without exiting cleanly are swept on startup so the
+    budget bounds total disk use.
+    """
+    root = os.path.join(os.getenv("APP_DATA_DIR", ".app_data"), "history")
+    remove_stale_spills(root)
+    return ResultSpillStore(
+        os.path.join(root, str(os.getpid())),
+        max_bytes=int(os.getenv("HISTORY_SPILL_MAX_BYTES", str(64 * 1024 * 1024)))
+    )
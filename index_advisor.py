@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+import streamlit as st
+from init_db import get_collection
+
+EQUALITY_OPERATORS = {"$eq", "$in"}
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$regex", "$exists", "$type", "$elemMatch", "$all"}
+HIGH_IMPACT_SHARE = 0.3
+MEDIUM_IMPACT_SHARE = 0.1
+
+
+class QueryLog:
+    """Append-only log of executed queries, capped to the most recent entries"""
+
+    def __init__(self, path, max_entries=20000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS queries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                operation TEXT,
+                query TEXT,
+                executed REAL
+            )
+        """)
+
+    def record(self, query: dict):
+        payload = json.dumps(query, default=str)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO queries (operation, query, executed) VALUES (?, ?, ?)",
+                (query.get("operation", ""), payload, time.time())
+            )
+            if cursor.lastrowid % 500 == 0:
+                self._conn.execute("DELETE FROM queries WHERE id <= ?", (cursor.lastrowid - self.max_entries,))
+
+    def queries(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT query FROM queries ORDER BY id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM queries")
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_log():
+    """Process-wide handle on the persistent executed-query log"""
+    data_dir = os.getenv("APP_DATA_DIR", ".app_data")
+    return QueryLog(
+        os.path.join(data_dir, "query_log.sqlite3"),
+        max_entries=int(os.getenv("QUERY_LOG_MAX_ENTRIES", "20000"))
+    )
+
+
+def _classify_filter(filter_doc, equality, ranges):
+    """Split a filter's top-level fields into equality and range predicates"""
+    if not isinstance(filter_doc, dict):
+        return
+    for field, condition in filter_doc.items():
+        if field == "$and" and isinstance(condition, list):
+            for clause in condition:
+                _classify_filter(clause, equality, ranges)
+        elif field.startswith("$"):
+            # $or branches need indexes of their own; $text/$expr can't use a b-tree prefix
+            continue
+        elif isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+            operators = set(condition)
+            if operators <= EQUALITY_OPERATORS:
+                equality.append(field)
+            elif operators & RANGE_OPERATORS:
+                ranges.append(field)
+        else:
+            equality.append(field)
+
+
+def _sort_pairs(sort):
+    if isinstance(sort, dict):
+        pairs = list(sort.items())
+    elif isinstance(sort, list):
+        pairs = [tuple(pair) if isinstance(pair, (list, tuple)) else (pair, 1) for pair in sort]
+    else:
+        return []
+    return [(field, -1 if direction in (-1, "desc", "descending") else 1)
+            for field, direction in pairs if isinstance(direction, (int, str))]
+
+
+def _pipeline_predicates(pipeline):
+    """Equality, sort and range fields from the leading stages that can use an index"""
+    equality, ranges, sort = [], [], []
+    for stage in pipeline:
+        if not isinstance(stage, dict) or len(stage) != 1:
+            break
+        name, spec = next(iter(stage.items()))
+        if name == "$match":
+            _classify_filter(spec, equality, ranges)
+        elif name == "$sort":
+            sort = _sort_pairs(spec)
+        elif name == "$group":
+            # A group key can be served in index order when nothing sorted it first
+            if not sort and isinstance(spec, dict):
+                keys = spec.get("_id")
+                keys = keys.values() if isinstance(keys, dict) else [keys]
+                sort = [(key[1:], 1) for key in keys if isinstance(key, str) and key.startswith("$")]
+            break
+        else:
+            break
+    return equality, sort, ranges
+
+
+def extract_predicates(query: dict):
+    """(collection, equality fields, sort pairs, range fields) for each indexable part of a query"""
+    operation = query.get("operation", "").lower()
+    if operation in ("bulk", "advanced") and isinstance(query.get("operations"), list):
+        for op in query["operations"]:
+            if isinstance(op, dict):
+                yield from extract_predicates({"collection": query.get("collection"), **op})
+        return
+    collection = query.get("collection")
+    if not collection:
+        return
+    equality, ranges, sort = [], [], []
+    if operation in ("find", "count"):
+        _classify_filter(query.get("query", {}), equality, ranges)
+        sort = _sort_pairs(query.get("sort"))
+    elif operation in ("update", "delete"):
+        _classify_filter(query.get("filter", query.get("query", {})), equality, ranges)
+    elif operation == "aggregate":
+        equality, sort, ranges = _pipeline_predicates(query.get("pipeline", []))
+    if equality or sort or ranges:
+        yield collection, equality, sort, ranges
+
+
+def esr_index(equality, sort, ranges) -> list:
+    """Compound index keys in equality, sort, range order, each field once"""
+    keys = OrderedDict()
+    for field in sorted(set(equality)):
+        keys[field] = 1
+    for field, direction in sort:
+        keys.setdefault(field, direction)
+    for field in sorted(set(ranges)):
+        keys.setdefault(field, 1)
+    return list(keys.items())
+
+
+def _is_prefix(keys, index_keys) -> bool:
+    if len(keys) > len(index_keys):
+        return False
+    head = index_keys[:len(keys)]
+    flipped = [(field, -direction) for field, direction in keys]
+    return keys == head or flipped == head
+
+
+def _impact(share: float) -> str:
+    if share >= HIGH_IMPACT_SHARE:
+        return "high"
+    if share >= MEDIUM_IMPACT_SHARE:
+        return "medium"
+    return "low"
+
+
+def _index_stats(collection):
+    """Existing b-tree indexes with their $indexStats operation counts"""
+    usage = {}
+    for entry in collection.aggregate([{"$indexStats": {}}]):
+        usage[entry["name"]] = {
+            "ops": entry.get("accesses", {}).get("ops", 0),
+            "since": str(entry.get("accesses", {}).get("since", ""))
+        }
+    indexes = []
+    for name, info in collection.index_information().items():
+        keys = [(field, direction) for field, direction in info["key"]]
+        indexes.append({"name": name, "key": keys, **usage.get(name, {"ops": None, "since": ""})})
+    return indexes
+
+
+def advise(collection_name: str, queries=None) -> dict:
+    """Recommend ESR compound indexes from logged predicates and flag unused indexes"""
+    if queries is None:
+        queries = get_query_log().queries()
+    shapes = Counter()
+    logged = 0
+    for query in queries:
+        matched = False
+        for collection, equality, sort, ranges in extract_predicates(query):
+            if collection == collection_name:
+                shapes[tuple(esr_index(equality, sort, ranges))] += 1
+                matched = True
+        logged += matched
+
+    try:
+        collection = get_collection(collection_name)
+        if collection is None:
+            return {"error": "Collection not found"}
+        existing = _index_stats(collection)
+    except Exception as e:
+        return {"error": f"Index statistics unavailable: {str(e)}"}
+
+    # A compound index also serves every query on one of its prefixes
+    candidates = sorted(shapes, key=len, reverse=True)
+    recommendations = []
+    for keys in candidates:
+        keys = list(keys)
+        if any(_is_prefix(keys, index["key"]) for index in existing):
+            continue
+        if any(_is_prefix(keys, rec["keys"]) for rec in recommendations):
+            continue
+        served = sum(count for shape, count in shapes.items() if _is_prefix(list(shape), keys))
+        share = served / logged if logged else 0.0
+        recommendations.append({
+            "keys": keys,
+            "index": dict(keys),
+            "queries": served,
+            "share": round(share, 3),
+            "impact": _impact(share)
+        })
+    recommendations.sort(key=lambda rec: -rec["queries"])
+
+    unused = [
+        {"name": index["name"], "key": dict(index["key"]), "since": index["since"]}
+        for index in existing
+        if index["name"] != "_id_" and index["ops"] == 0
+    ]
+    return {
+        "collection": collection_name,
+        "logged_queries": logged,
+        "recommendations": recommendations,
+        "unused_indexes": unused,
+        "existing_indexes": [{"name": index["name"], "ops": index["ops"]} for index in existing]
+    }
@@ -0,0 +1,267 @@
+import os
+import io
+import csv
+import json
+import time
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from bson import json_util
+from pymongo.errors import BulkWriteError
+from mongo_utils import get_database_name, get_mongo_client
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_SAMPLE_ROWS = int(os.getenv("INGEST_SAMPLE_ROWS", "200"))
+INGEST_READ_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 20
+COLUMN_TYPES = ("int", "float", "bool", "date", "string", "skip")
+TRUE_VALUES = {"true", "yes", "y", "1"}
+FALSE_VALUES = {"false", "no", "n", "0"}
+
+
+def detect_format(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith(".json"):
+        return "json"
+    return "csv"
+
+
+def _iter_json_array(text):
+    """Objects of a top-level JSON array, decoded as the text streams in"""
+    decoder = json.JSONDecoder(object_hook=json_util.object_hook)
+    buffer, position, started = "", 0, False
+    while True:
+        chunk = text.read(INGEST_READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != "[":
+                    raise ValueError("JSON files must contain an array of documents")
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                document, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            yield document
+            position = end
+        if not chunk:
+            return
+
+
+def iter_records(stream, fmt: str):
+    """Stream raw records (dicts) out of a binary file object without reading it whole"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(text)
+        elif fmt == "ndjson":
+            for line in text:
+                if line.strip():
+                    yield json_util.loads(line)
+        else:
+            yield from _iter_json_array(text)
+    finally:
+        # Leave the caller's stream open; the wrapper would close it on collection
+        text.detach()
+
+
+def _infer_value_type(value: str) -> str:
+    try:
+        int(value)
+        return "int"
+    except ValueError:
+        pass
+    try:
+        float(value)
+        return "float"
+    except ValueError:
+        pass
+    if value.lower() in TRUE_VALUES | FALSE_VALUES:
+        return "bool"
+    try:
+        datetime.fromisoformat(value)
+        return "date"
+    except ValueError:
+        return "string"
+
+
+def infer_types(sample: list) -> dict:
+    """Narrowest type per column that fits every non-empty sampled string value"""
+    seen = {}
+    for record in sample:
+        for column, value in record.items():
+            if column is None or not isinstance(value, str) or value.strip() == "":
+                continue
+            seen.setdefault(column, set()).add(_infer_value_type(value.strip()))
+    types = {}
+    for column, kinds in seen.items():
+        if kinds <= {"int", "float"}:
+            types[column] = "float" if "float" in kinds else "int"
+        else:
+            types[column] = kinds.pop() if len(kinds) == 1 else "string"
+    return types
+
+
+def coerce_value(value, kind: str):
+    """Convert a raw string to a column type; raises ValueError when it doesn't fit"""
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    if value == "":
+        return None
+    if kind == "int":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    if kind == "bool":
+        lowered = value.lower()
+        if lowered not in TRUE_VALUES | FALSE_VALUES:
+            raise ValueError(f"not a boolean: {value}")
+        return lowered in TRUE_VALUES
+    if kind == "date":
+        return datetime.fromisoformat(value)
+    return value
+
+
+def parse_type_hints(text: str) -> dict:
+    """'column: type' lines from the UI into a hints dict"""
+    hints = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        column, _, kind = line.partition(":")
+        kind = kind.strip().lower()
+        if kind not in COLUMN_TYPES:
+            raise ValueError(f"Unknown type '{kind}' for column '{column.strip()}'; use one of {', '.join(COLUMN_TYPES)}")
+        hints[column.strip()] = kind
+    return hints
+
+
+class Ingestion:
+    """Typed, batched, back-pressured load of one file into one collection"""
+
+    def __init__(self, collection_name: str, batch_size: int = INGEST_BATCH_SIZE,
+                 workers: int = INGEST_WORKERS):
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.workers = workers
+        self.read = self.inserted = self.failed = self.coercion_errors = self.batches = 0
+        self.errors = []
+        self.types = {}
+        self.started = None
+
+    def _convert(self, record: dict) -> dict:
+        document = {}
+        for column, value in record.items():
+            if column is None:
+                continue  # CSV rows with more cells than the header
+            kind = self.types.get(column)
+            if kind == "skip":
+                continue
+            if kind:
+                try:
+                    value = coerce_value(value, kind)
+                except ValueError:
+                    self.coercion_errors += 1
+            elif isinstance(value, str) and value == "":
+                value = None
+            document[column] = value
+        return document
+
+    def _insert(self, collection, batch):
+        try:
+            return len(collection.insert_many(batch, ordered=False).inserted_ids), []
+        except BulkWriteError as e:
+            return e.details.get("nInserted", 0), [err.get("errmsg") for err in e.details.get("writeErrors", [])]
+        except Exception as e:
+            return 0, [f"Batch failed: {str(e)}"] * len(batch)
+
+    def _collect(self, future):
+        inserted, errors = future.result()
+        self.inserted += inserted
+        self.failed += len(errors)
+        self.errors.extend(errors[:MAX_REPORTED_ERRORS - len(self.errors)])
+
+    def progress(self) -> dict:
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        return {
+            "collection": self.collection_name,
+            "read": self.read,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "coercion_errors": self.coercion_errors,
+            "batches": self.batches,
+            "seconds": round(elapsed, 2),
+            "docs_per_sec": round(self.inserted / elapsed) if elapsed else 0,
+            "types": self.types,
+            "errors": self.errors
+        }
+
+    def run(self, records, hints=None, progress=None) -> dict:
+        """Infer types from a leading sample, then insert fixed-size batches on a worker pool.
+
+        At most two batches per worker are in flight; reading waits for the
+        oldest one when the database falls behind, so memory stays bounded by
+        the batch size rather than the file size.
+        """
+        self.started = time.perf_counter()
+        records = iter(records)
+        sample = list(islice(records, INGEST_SAMPLE_ROWS))
+        self.types = {**infer_types(sample), **(hints or {})}
+        collection = get_mongo_client()[get_database_name()][self.collection_name]
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest") as pool:
+            batch = []
+            for record in chain(sample, records):
+                self.read += 1
+                batch.append(self._convert(record))
+                if len(batch) < self.batch_size:
+                    continue
+                if len(in_flight) >= self.workers * 2:
+                    self._collect(in_flight.popleft())
+                in_flight.append(pool.submit(self._insert, collection, batch))
+                self.batches += 1
+                batch = []
+                while in_flight and in_flight[0].done():
+                    self._collect(in_flight.popleft())
+                if progress:
+                    progress(self.progress())
+            if batch:
+                in_flight.append(pool.submit(self._insert, collection, batch))
+                self.batches += 1
+            while in_flight:
+                self._collect(in_flight.popleft())
+                if progress:
+                    progress(self.progress())
+        return self.progress()
+
+
+def ingest_file(stream, filename: str, collection_name: str, hints=None, progress=None, fmt: str = None) -> dict:
+    """Load a CSV, JSON array or NDJSON file into a collection; returns the final counters"""
+    try:
+        records = iter_records(stream, fmt or detect_format(filename))
+        return Ingestion(collection_name).run(records, hints, progress)
+    except Exception as e:
+        return {"error": f"Ingestion failed: {str(e)}"}
+
+
+def preview_types(stream, filename: str) -> dict:
+    """Column types inferred from the leading sample of a file"""
+    records = iter_records(stream, detect_format(filename))
+    try:
+        return infer_types(list(islice(records, INGEST_SAMPLE_ROWS)))
+    finally:
+        records.close()
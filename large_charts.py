@@ -0,0 +1,86 @@
+import os
+import math
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+WEBGL_THRESHOLD = int(os.getenv("CHART_WEBGL_THRESHOLD", "5000"))
+CHART_POINT_BUDGET = int(os.getenv("CHART_POINT_BUDGET", "5000"))
+
+
+def _numeric(series: pd.Series) -> np.ndarray:
+    """Float positions for numbers, datetimes or (by order) anything else"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("int64").to_numpy(dtype=float)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=float)
+    return np.arange(len(series), dtype=float)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, budget: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indexes of `budget` points that keep a line's shape"""
+    n = len(x)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+    every = (n - 2) / (budget - 2)
+    selected = [0]
+    anchor = 0
+    for i in range(budget - 2):
+        start = int(math.floor(i * every)) + 1
+        end = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        # Keep the point forming the largest triangle with the last kept point and the next bucket's mean
+        area = np.abs((x[anchor] - avg_x) * (y[start:end] - y[anchor])
+                      - (x[anchor] - x[start:end]) * (avg_y - y[anchor]))
+        anchor = start + int(area.argmax())
+        selected.append(anchor)
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def grid_sample(x: np.ndarray, y: np.ndarray, budget: int):
+    """One representative point per occupied grid cell, with the number of points it stands for"""
+    cells = max(1, int(math.sqrt(budget)))
+
+    def cell(values):
+        span = values.max() - values.min()
+        return ((values - values.min()) / (span or 1) * (cells - 1)).round().astype(np.int64)
+
+    keys = cell(x) * cells + cell(y)
+    _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    return first, counts
+
+
+def _title(base: str, original: int, rendered: int, method: str) -> str:
+    if rendered == original:
+        return base
+    return f"{base} ({rendered:,} of {original:,} points, {method})"
+
+
+def line_figure(df: pd.DataFrame, x: str, y: str, title: str = "Line Chart", budget: int = CHART_POINT_BUDGET):
+    """Line chart that switches to WebGL and LTTB downsampling for large frames"""
+    if len(df) <= WEBGL_THRESHOLD:
+        return px.line(df, x=x, y=y, title=title)
+    data = df[[x, y]].dropna()
+    if not pd.api.types.is_numeric_dtype(data[y]):
+        return px.line(df, x=x, y=y, title=title, render_mode="webgl")
+    if pd.api.types.is_numeric_dtype(data[x]) or pd.api.types.is_datetime64_any_dtype(data[x]):
+        data = data.sort_values(x, kind="stable")
+    keep = lttb(_numeric(data[x]), data[y].to_numpy(dtype=float), budget)
+    sampled = data.iloc[keep]
+    return px.line(sampled, x=x, y=y, render_mode="webgl",
+                   title=_title(title, len(df), len(sampled), "LTTB"))
+
+
+def scatter_figure(df: pd.DataFrame, x: str, y: str, title: str = "Scatter Plot", budget: int = CHART_POINT_BUDGET):
+    """Scatter plot that switches to WebGL and grid binning for large frames"""
+    if len(df) <= WEBGL_THRESHOLD:
+        return px.scatter(df, x=x, y=y, title=title)
+    data = df[[x, y]].dropna()
+    if len(data) <= budget:
+        return px.scatter(df, x=x, y=y, title=title, render_mode="webgl")
+    first, counts = grid_sample(_numeric(data[x]), _numeric(data[y]), budget)
+    sampled = data.iloc[first].assign(points=counts)
+    return px.scatter(sampled, x=x, y=y, color="points", render_mode="webgl",
+                      title=_title(title, len(df), len(sampled), "grid-binned"))
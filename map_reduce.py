@@ -0,0 +1,175 @@
+import re
+
+# A map function whose whole body is one emit(<key>, <value>) statement
+MAP_PATTERN = re.compile(r"function\s*\w*\s*\(\s*\)\s*\{\s*emit\s*\((.*)\)\s*;?\s*\}", re.DOTALL)
+FIELD_PATTERN = re.compile(r"""^this(?:\.([A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*)|\[\s*['"]([^'"]+)['"]\s*\])$""")
+NUMBER_PATTERN = re.compile(r"^-?\d+(?:\.\d+)?$")
+STRING_PATTERN = re.compile(r"""^(['"])(.*)\1$""")
+
+# Reduce functions are compacted (whitespace removed, values parameter renamed
+# to "values") and must be exactly one of these shapes; anything else, such as
+# Array.sum(values)*2 or max - min, is rejected rather than approximated
+RETURN_FORMS = [
+    re.compile(r"function\w*\(\w+,values\)\{return(.+?);?\}"),
+    re.compile(r"\(\w+,values\)=>\{return(.+?);?\}"),
+    re.compile(r"\(\w+,values\)=>(.+)"),
+]
+SUM_FORMS = [
+    r"Array\.sum\(values\)",
+    r"values\.reduce\(\(?(\w+),(\w+)\)?=>\1\+\2(?:,0)?\)",
+    r"values\.reduce\(function\w*\((\w+),(\w+)\)\{return\1\+\2;?\}(?:,0)?\)",
+]
+REDUCE_EXPRESSIONS = [(accumulator, re.compile(pattern)) for accumulator, pattern in [
+    *[("$sum", form) for form in SUM_FORMS],
+    ("$avg", r"Array\.avg\(values\)"),
+    *[("$avg", rf"\(?{form}\)?/values\.length") for form in SUM_FORMS],
+    ("$max", r"Math\.max\.apply\((?:null|Math),values\)|Math\.max\(\.\.\.values\)"),
+    ("$min", r"Math\.min\.apply\((?:null|Math),values\)|Math\.min\(\.\.\.values\)"),
+    ("count", r"values\.length"),
+    ("$push", r"values"),
+]]
+# Accumulating loops that return the running total unchanged
+SUM_LOOPS = [
+    re.compile(r"function\w*\(\w+,values\)\{(?:var|let)?(\w+)=0;"
+               r"for\((?:var|let)?(\w+)=0;\2<values\.length;(?:\2\+\+|\+\+\2|\2\+=1)\)"
+               r"\{?\1\+=values\[\2\];?\}?return\1;?\}"),
+    re.compile(r"function\w*\(\w+,values\)\{(?:var|let)?(\w+)=0;"
+               r"for\((?:var|let|const)?(\w+)ofvalues\)\{?\1\+=\2;?\}?return\1;?\}"),
+]
+REDUCE_PARAMS = re.compile(r"^(?:function\s*\w*\s*)?\(\s*\w+\s*,\s*(\w+)\s*\)")
+
+
+def _strip_js(source: str) -> str:
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.DOTALL)
+    return re.sub(r"//[^\n]*", "", source).strip()
+
+
+def _balanced(text: str) -> bool:
+    """True when brackets never close below the top level and all close by the end"""
+    depth = 0
+    for char in text:
+        if char in "({[":
+            depth += 1
+        elif char in ")}]":
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0
+
+
+def _split_arguments(text: str) -> list:
+    """Split on top-level commas only"""
+    parts, depth, current = [], 0, ""
+    for char in text:
+        if char in "({[":
+            depth += 1
+        elif char in ")}]":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    parts.append(current.strip())
+    return parts
+
+
+def _expression(text: str):
+    """A map-side key/value expression as an aggregation expression"""
+    text = text.strip()
+    field = FIELD_PATTERN.match(text)
+    if field:
+        return "$" + (field.group(1) or field.group(2))
+    if NUMBER_PATTERN.match(text):
+        return float(text) if "." in text else int(text)
+    string = STRING_PATTERN.match(text)
+    if string:
+        return string.group(2)
+    if text == "null":
+        return None
+    if text.startswith("{") and text.endswith("}"):
+        document = {}
+        for pair in _split_arguments(text[1:-1]):
+            if not pair:
+                continue
+            name, _, value = pair.partition(":")
+            name = name.strip().strip("'\"")
+            if not name or not value:
+                raise ValueError(f"Unsupported map_reduce key: {text}")
+            document[name] = _expression(value)
+        return document
+    if text.startswith("[") and text.endswith("]"):
+        return [_expression(item) for item in _split_arguments(text[1:-1]) if item]
+    raise ValueError(f"Unsupported map_reduce expression: {text}")
+
+
+def parse_map(map_source: str):
+    """(key, value) aggregation expressions from a map function, or None.
+
+    Only a body that is exactly one top-level emit(key, value) statement
+    translates; a conditional emit or any other code around it would be
+    dropped by $group, so those return None.
+    """
+    match = MAP_PATTERN.fullmatch(_strip_js(map_source))
+    if not match or not _balanced(match.group(1)):
+        return None
+    arguments = _split_arguments(match.group(1))
+    if len(arguments) != 2:
+        return None
+    try:
+        return _expression(arguments[0]), _expression(arguments[1])
+    except ValueError:
+        return None
+
+
+def parse_reduce(reduce_source: str) -> str:
+    """The accumulator a reduce function implements"""
+    source = _strip_js(reduce_source)
+    params = REDUCE_PARAMS.match(source)
+    if params and params.group(1) != "values":
+        source = re.sub(rf"\b{params.group(1)}\b", "values", source)
+    compact = re.sub(r"\s+", "", source)
+    if any(loop.fullmatch(compact) for loop in SUM_LOOPS):
+        return "$sum"
+    for form in RETURN_FORMS:
+        returned = form.fullmatch(compact)
+        if returned:
+            for accumulator, pattern in REDUCE_EXPRESSIONS:
+                if pattern.fullmatch(returned.group(1)):
+                    return accumulator
+            break
+    raise ValueError("Unsupported reduce function; sum, avg, count, min, max and push "
+                     "shapes can be translated")
+
+
+def translate(query: dict) -> list:
+    """Aggregation pipeline equivalent to a generated map_reduce operation.
+
+    Results keep map-reduce's {_id, value} shape and are returned inline;
+    the `out` collection is never written. Raises ValueError for shapes that
+    have no exact $group equivalent.
+    """
+    if query.get("finalize"):
+        raise ValueError("map_reduce with a finalize function is not supported")
+    emitted = parse_map(query["map"])
+    if emitted is None:
+        raise ValueError("Only map functions whose body is a single emit(key, value) of fields "
+                         "and literals can be translated")
+    key, value = emitted
+    accumulator = parse_reduce(query["reduce"])
+    if accumulator == "count":
+        accumulator, value = "$sum", 1
+    elif isinstance(value, (dict, list)) and accumulator != "$push":
+        # $sum/$avg over documents quietly yield 0 or null instead of failing
+        raise ValueError(f"An emitted document or array can only be collected with push, not {accumulator}")
+
+    pipeline = []
+    if query.get("query"):
+        pipeline.append({"$match": query["query"]})
+    if query.get("sort"):
+        pipeline.append({"$sort": query["sort"]})
+    if query.get("limit"):
+        pipeline.append({"$limit": query["limit"]})
+    pipeline.append({"$group": {"_id": key, "value": {accumulator: value}}})
+    pipeline.append({"$sort": {"_id": 1}})
+    return pipeline
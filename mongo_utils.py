@@ -1,24 +1,200 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
 import pandas as pd
 import re
 
-def get_mongo_client():
-    return MongoClient(
-        host=st.secrets["mongo"]["host"],
-        username=st.secrets["mongo"]["username"],
-        password=st.secrets["mongo"]["password"],
-        authSource="admin",
-        tls=True,
-        tlsAllowInvalidCertificates=False
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Collects connection pool metrics from pymongo's CMAP events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()  # checkout events fire on the requesting thread
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def _finish_wait(self):
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return (time.perf_counter() - started) * 1000 if started else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        waited = self._finish_wait()
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.wait_ms_total += waited
+            self.wait_ms_max = max(self.wait_ms_max, waited)
+
+    def connection_check_out_failed(self, event):
+        self._finish_wait()
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checked_out": self.checked_out,
+                "open_connections": self.created - self.closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.wait_ms_max, 3),
+                "connections_created": self.created,
+                "connections_closed": self.closed,
+                "pool_clears": self.pool_clears
+            }
+
+
+def _client_options() -> dict:
+    """Connection settings from MONGO_URI, falling back to Streamlit secrets"""
+    uri = os.getenv("MONGO_URI")
+    if uri:
+        return {"host": uri}
+    mongo = st.secrets["mongo"]
+    return {
+        "host": mongo["host"],
+        "username": mongo["username"],
+        "password": mongo["password"],
+        "authSource": "admin",
+        "tls": True,
+        # Certificates are verified unless a deployment explicitly opts out
+        "tlsAllowInvalidCertificates": mongo.get("tls_allow_invalid_certificates", False) is True
+    }
+
+
+def get_database_name() -> str:
+    return os.getenv("MONGO_DATABASE") or st.secrets["mongo"]["database"]
+
+
+class MongoClientManager:
+    """Owns the single MongoClient of this process, its pool warm-up and health checks"""
+
+    def __init__(self, max_pool_size=50, min_pool_size=5, health_interval=30):
+        self.metrics = PoolMetricsListener()
+        self.min_pool_size = min_pool_size
+        self.client = MongoClient(
+            maxPoolSize=max_pool_size,
+            minPoolSize=min_pool_size,
+            serverSelectionTimeoutMS=3000,
+            connectTimeoutMS=3000,
+            event_listeners=[self.metrics],
+            **_client_options()
+        )
+        self.healthy = False
+        self.last_health_check = None
+        self.last_ping_ms = None
+        self._stop = threading.Event()
+        try:
+            self.warm_up()
+        except Exception:
+            self.client.close()
+            raise
+        if health_interval > 0:
+            threading.Thread(
+                target=self._health_loop,
+                args=(health_interval,),
+                name="mongo-health",
+                daemon=True
+            ).start()
+
+    def ping(self):
+        started = time.perf_counter()
+        self.client.admin.command("ping")
+        self.last_ping_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.last_health_check = time.time()
+        self.healthy = True
+
+    def warm_up(self):
+        """Open minPoolSize connections now instead of on the first user queries"""
+        self.ping()
+        if self.min_pool_size > 1:
+            with ThreadPoolExecutor(max_workers=self.min_pool_size) as pool:
+                list(pool.map(lambda _: self.client.admin.command("ping"), range(self.min_pool_size)))
+
+    def _health_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.ping()
+            except Exception:
+                self.healthy = False
+                self.last_health_check = time.time()
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "last_ping_ms": self.last_ping_ms,
+            "last_health_check": self.last_health_check,
+            **self.metrics.snapshot()
+        }
+
+    def close(self):
+        self._stop.set()
+        self.client.close()
+
+
+@st.cache_resource(show_spinner=False)
+def get_client_manager():
+    """Process-wide MongoDB client manager; every connection goes through it"""
+    return MongoClientManager(
+        max_pool_size=int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+        min_pool_size=int(os.getenv("MONGO_MIN_POOL_SIZE", "5")),
+        health_interval=int(os.getenv("MONGO_HEALTH_INTERVAL", "30"))
     )
 
-def get_collection():
-    client = get_mongo_client()
-    db = client[st.secrets["mongo"]["database"]]
-    return db[st.secrets["mongo"]["collection"]]
+def get_mongo_client():
+    return get_client_manager().client
+
+def get_collection(collection_name="students"):
+    return get_mongo_client()[get_database_name()][collection_name]
 
-def get_schema():
+def get_schema(collection_name="students"):
+    # Imported here: schema_catalog builds on this module's client manager
+    from schema_catalog import get_collection_schema
+    schema = get_collection_schema(collection_name)
+    if schema is not None:
+        return f"MongoDB Collection: {collection_name}\nFields:\n{schema.compact()}"
     return """
     MongoDB Collection: students
     Fields:
@@ -32,7 +208,7 @@ def get_schema():
     """
 
 def execute_mongo_query(query: dict):
-    collection = get_collection()
+    collection = get_collection(query.get("collection", "students"))
     try:
         # Handle different query types
         if "find" in query:
@@ -54,4 +230,4 @@ def execute_mongo_query(query: dict):
         else:
             return {"error": "Invalid query type"}
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
@@ -0,0 +1,138 @@
+import os
+from init_db import get_collection
+from result_set import MAX_RESULT_DOCS, cap_pipeline
+
+PLAN_SCAN_LIMIT = int(os.getenv("PLAN_SCAN_LIMIT", "100000"))
+PLAN_SCAN_POLICY = os.getenv("PLAN_SCAN_POLICY", "warn")  # "warn" or "refuse"
+PLAN_MAX_TIME_MS = int(os.getenv("PLAN_MAX_TIME_MS", "5000"))
+EXPLAINABLE_OPERATIONS = {"find", "count", "update", "delete", "aggregate"}
+WRITE_STAGES = {"$out", "$merge"}
+
+
+def _sort_document(sort):
+    """Generated sorts come as dicts or [field, direction] pairs; explain needs a document"""
+    if isinstance(sort, dict):
+        return sort
+    if isinstance(sort, list):
+        return dict(pair if isinstance(pair, (list, tuple)) else (pair, 1) for pair in sort)
+    return None
+
+
+def explain_command(query: dict):
+    """The database command explain wraps for a generated query, or None when it has no plan"""
+    operation = query.get("operation", "").lower()
+    name = query.get("collection")
+    if operation not in EXPLAINABLE_OPERATIONS or not name:
+        return None
+    if operation == "find":
+        command = {"find": name, "filter": query.get("query", {})}
+        sort = _sort_document(query.get("sort"))
+        if sort:
+            command["sort"] = sort
+        limit = query.get("limit", 100)
+        if isinstance(limit, int) and limit > 0:
+            command["limit"] = limit
+        return command
+    if operation == "count":
+        return {"count": name, "query": query.get("query", {})}
+    if operation in ("update", "delete"):
+        # Only the filter decides how a write finds its documents
+        return {"find": name, "filter": query.get("filter", query.get("query", {}))}
+    return {"aggregate": name, "pipeline": cap_pipeline(query.get("pipeline", []), MAX_RESULT_DOCS),
+            "cursor": {}}
+
+
+def _walk(node, visit):
+    if isinstance(node, dict):
+        visit(node)
+        for value in node.values():
+            _walk(value, visit)
+    elif isinstance(node, list):
+        for item in node:
+            _walk(item, visit)
+
+
+def _first(node, key):
+    """First value stored under `key` anywhere in an explain document"""
+    found = []
+    _walk(node, lambda doc: key in doc and not found and found.append(doc[key]))
+    return found[0] if found else None
+
+
+def summarize_plan(explain: dict) -> dict:
+    """Winning-plan stages, index usage and execution counters from an explain document"""
+    winning = []
+    _walk(explain, lambda doc: "winningPlan" in doc and winning.append(doc["winningPlan"]))
+    stages, indexes = [], []
+
+    def visit(doc):
+        if isinstance(doc.get("stage"), str):
+            stages.append(doc["stage"])
+        if isinstance(doc.get("indexName"), str) and doc["indexName"] not in indexes:
+            indexes.append(doc["indexName"])
+
+    for plan in winning:
+        _walk(plan, visit)
+    summary = {
+        "stages": stages,
+        "indexes": indexes,
+        "collection_scan": "COLLSCAN" in stages,
+    }
+    stats = _first(explain, "executionStats")
+    if stats:
+        summary.update({
+            "docs_examined": stats.get("totalDocsExamined"),
+            "keys_examined": stats.get("totalKeysExamined"),
+            "returned": stats.get("nReturned"),
+            "execution_ms": stats.get("executionTimeMillis")
+        })
+    return summary
+
+
+def analyze_query(query: dict, execution_stats: bool = False, scan_limit: int = PLAN_SCAN_LIMIT,
+                  policy: str = PLAN_SCAN_POLICY):
+    """Explain a generated query before it runs and judge whether it is safe to execute.
+
+    Returns None for operations without a query plan (inserts, bulk, advanced).
+    The verdict is "ok", "warn" or "refuse"; only collection scans over more
+    than `scan_limit` documents are refused, and only when `policy` says so.
+    executionStats actually runs the query, so it is skipped for plans that
+    would be refused.
+    """
+    command = explain_command(query)
+    if command is None:
+        return None
+    try:
+        collection = get_collection(query["collection"])
+        if collection is None:
+            return {"error": "Collection not found"}
+        db = collection.database
+        explain = db.command({"explain": command, "verbosity": "queryPlanner"}, maxTimeMS=PLAN_MAX_TIME_MS)
+        plan = summarize_plan(explain)
+        plan["collection_size"] = collection.estimated_document_count()
+
+        # An unfiltered, unsorted find stops after its limit however big the collection is
+        bounded = bool(command.get("limit")) and not command.get("filter") and "sort" not in command
+        oversized_scan = plan["collection_scan"] and not bounded and plan["collection_size"] > scan_limit
+        writes = any(stage.keys() & WRITE_STAGES for stage in command.get("pipeline", []))
+        if execution_stats and not oversized_scan and not writes:
+            explain = db.command({"explain": command, "verbosity": "executionStats"}, maxTimeMS=PLAN_MAX_TIME_MS)
+            plan.update(summarize_plan(explain))
+    except Exception as e:
+        return {"error": f"Explain failed: {str(e)}"}
+
+    # Without executionStats a collection scan is costed at the whole collection
+    if plan.get("docs_examined") is not None:
+        plan["estimated_cost"] = plan["docs_examined"] + (plan.get("keys_examined") or 0)
+    elif plan["collection_scan"]:
+        plan["estimated_cost"] = plan["collection_size"]
+    else:
+        plan["estimated_cost"] = None
+
+    if oversized_scan:
+        plan["verdict"] = "refuse" if policy == "refuse" else "warn"
+        plan["message"] = (f"Collection scan over ~{plan['collection_size']} documents "
+                           f"in {query['collection']} (limit {scan_limit})")
+    else:
+        plan["verdict"] = "ok"
+    return plan
@@ -0,0 +1,291 @@
+import os
+import re
+import logging
+import threading
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1200"))
+MAX_EXAMPLES = 3
+
+PROMPT_HEADER = """
+You are an expert MongoDB developer. Convert this natural language command into a MongoDB query in JSON format.
+
+Important:
+- Every query has "operation" (find, insert, update, delete, aggregate, count, bulk, advanced) and "collection"
+- find and count use "query"; update uses "filter" and "update"; delete uses "filter"; aggregate uses "pipeline"
+- For bulk operations, use "bulk" operation with "operations" array
+- For advanced operations, use "advanced" operation with specific parameters
+- Use proper MongoDB syntax for complex queries
+- Support transactions, geospatial queries, text search, etc.
+"""
+
+# (intents, example) pairs; an example is offered when one of its intents matches
+EXAMPLES = [
+    ({"find"}, """Find:
+Command: "Show Computer Science students with GPA above 3.5"
+{
+  "operation": "find",
+  "collection": "students",
+  "query": {"major": "Computer Science", "gpa": {"$gt": 3.5}}
+}"""),
+    ({"count"}, """Count:
+Command: "How many students enrolled after 2020?"
+{
+  "operation": "count",
+  "collection": "students",
+  "query": {"enrollment_year": {"$gt": 2020}}
+}"""),
+    ({"insert"}, """Insert:
+Command: "Add new student: John, Computer Science, 2023"
+{
+  "operation": "insert",
+  "collection": "students",
+  "document": {"name": "John", "major": "Computer Science", "enrollment_year": 2023}
+}"""),
+    ({"update"}, """Update:
+Command: "Increase salary by 10% for Data Science students"
+{
+  "operation": "update",
+  "collection": "students",
+  "filter": {"major": "Data Science"},
+  "update": {"$mul": {"salary": 1.1}}
+}"""),
+    ({"delete"}, """Delete:
+Command: "Remove students enrolled before 2020"
+{
+  "operation": "delete",
+  "collection": "students",
+  "filter": {"enrollment_year": {"$lt": 2020}}
+}"""),
+    ({"aggregate"}, """Aggregate:
+Command: "Show average salary by major"
+{
+  "operation": "aggregate",
+  "collection": "students",
+  "pipeline": [{"$group": {"_id": "$major", "average_salary": {"$avg": "$salary"}}}]
+}"""),
+    ({"bulk", "insert"}, """Bulk Insert:
+Command: "Add three new students: Alice (GPA 3.8), Bob (GPA 3.5), Charlie (GPA 3.9)"
+{
+  "operation": "bulk",
+  "operations": [
+    {
+      "operation": "insert",
+      "collection": "students",
+      "document": {"name": "Alice", "gpa": 3.8}
+    },
+    {
+      "operation": "insert",
+      "collection": "students",
+      "document": {"name": "Bob", "gpa": 3.5}
+    },
+    {
+      "operation": "insert",
+      "collection": "students",
+      "document": {"name": "Charlie", "gpa": 3.9}
+    }
+  ]
+}"""),
+    ({"transaction"}, """Transaction (Update and Delete):
+Command: "Transfer 10000 salary from Alice to Bob and remove Charlie's enrollment"
+{
+  "operation": "advanced",
+  "advanced_operation": "transaction",
+  "operations": [
+    {
+      "operation": "update",
+      "collection": "students",
+      "filter": {"name": "Alice"},
+      "update": {"$inc": {"salary": -10000}}
+    },
+    {
+      "operation": "update",
+      "collection": "students",
+      "filter": {"name": "Bob"},
+      "update": {"$inc": {"salary": 10000}}
+    },
+    {
+      "operation": "delete",
+      "collection": "enrollments",
+      "filter": {"student": "Charlie"}
+    }
+  ]
+}"""),
+    ({"text"}, """Text Search:
+Command: "Find courses related to machine learning"
+{
+  "operation": "advanced",
+  "advanced_operation": "text_search",
+  "collection": "courses",
+  "search_term": "machine learning"
+}"""),
+    ({"geo"}, """Geospatial Query:
+Command: "Find students within 5km of New York"
+{
+  "operation": "advanced",
+  "advanced_operation": "geospatial",
+  "collection": "students",
+  "coordinates": [-74.0059, 40.7128],
+  "max_distance": 5000
+}"""),
+    ({"map_reduce"}, """Map-Reduce:
+Command: "Calculate average GPA by department using map-reduce"
+{
+  "operation": "advanced",
+  "advanced_operation": "map_reduce",
+  "collection": "students",
+  "map": "function() { emit(this.major, this.gpa); }",
+  "reduce": "function(key, values) { return Array.avg(values); }"
+}"""),
+    ({"index"}, """Create Index:
+Command: "Create text index on course titles"
+{
+  "operation": "advanced",
+  "advanced_operation": "create_index",
+  "collection": "courses",
+  "index": {"title": "text"}
+}"""),
+]
+
+INTENT_KEYWORDS = {
+    "find": ["show", "find", "list", "get", "display", "which", "who", "fetch", "select"],
+    "count": ["count", "how many", "number of"],
+    "insert": ["add", "insert", "create new", "new student", "new course", "enroll"],
+    "update": ["update", "increase", "decrease", "raise", "set", "change", "rename", "modify", "give"],
+    "delete": ["remove", "delete", "drop", "erase"],
+    "aggregate": ["average", "avg", "sum", "total", "group", "by", "per", "maximum", "minimum",
+                  "highest", "lowest", "top"],
+    "bulk": ["three", "several", "multiple", "bulk", "these", "following"],
+    "transaction": ["transfer", "transaction", "atomically", "and then"],
+    "text": ["related to", "search", "mention", "about", "containing", "keyword"],
+    "geo": ["near", "within", "km", "miles", "distance", "location", "nearby"],
+    "map_reduce": ["map-reduce", "map reduce", "mapreduce"],
+    "index": ["index"],
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for budgeting"""
+    return (len(text) + 3) // 4
+
+
+def classify_intents(command: str) -> list:
+    """Rank query intents for a command by keyword hits; falls back to find"""
+    text = f" {command.lower()} "
+    scores = {}
+    for intent, keywords in INTENT_KEYWORDS.items():
+        hits = sum(1 for keyword in keywords if re.search(rf"(?<!\w){re.escape(keyword)}(?:s|es)?(?!\w)", text))
+        if hits:
+            scores[intent] = hits
+    if not scores:
+        return ["find"]
+    return sorted(scores, key=lambda intent: -scores[intent])
+
+
+@lru_cache(maxsize=256)
+def _example_block(intents: tuple, budget: int) -> str:
+    """Numbered examples for the given intents, best match first, within a token budget"""
+    ranked = []
+    for intent in intents:
+        for idx, (tags, text) in enumerate(EXAMPLES):
+            if intent in tags and idx not in ranked:
+                ranked.append(idx)
+    chosen, used = [], 0
+    for idx in ranked[:MAX_EXAMPLES]:
+        text = EXAMPLES[idx][1]
+        cost = estimate_tokens(text)
+        if chosen and used + cost > budget:
+            continue
+        chosen.append(text)
+        used += cost
+    return "\n\n".join(f"{n}. {text}" for n, text in enumerate(chosen, start=1))
+
+
+def _schema_fragment(command: str, schema_hint: str, budget: int) -> str:
+    """Schema lines for fields the command mentions first, then the rest while budget allows"""
+    if not schema_hint:
+        return ""
+    text = command.lower()
+    lines = [line for line in schema_hint.splitlines() if line.strip()]
+
+    def mentioned(line):
+        field = line.lstrip("- ").split(":", 1)[0].lower()
+        return field in text or field.replace("_", " ") in text
+
+    ordered = [line for line in lines if mentioned(line)] + [line for line in lines if not mentioned(line)]
+    chosen, used = [], 0
+    for line in ordered:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        chosen.append(line)
+        used += cost
+    return "\n".join(chosen)
+
+
+class PromptStats:
+    """Running prompt-size counters for the debug panel"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.tokens = 0
+        self.full_tokens = 0
+        self.last = {}
+
+    def record(self, entry: dict):
+        with self._lock:
+            self.prompts += 1
+            self.tokens += entry["tokens"]
+            self.full_tokens += entry["full_template_tokens"]
+            self.last = entry
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "prompts": self.prompts,
+                "avg_tokens": round(self.tokens / self.prompts) if self.prompts else 0,
+                "avg_tokens_saved": round((self.full_tokens - self.tokens) / self.prompts) if self.prompts else 0,
+                "last": self.last
+            }
+
+
+prompt_stats = PromptStats()
+FULL_TEMPLATE_TOKENS = estimate_tokens(PROMPT_HEADER + "\n\n".join(text for _, text in EXAMPLES))
+
+
+def compile_query_prompt(command: str, collection_name: str, schema_hint: str = "",
+                         token_budget: int = PROMPT_TOKEN_BUDGET) -> str:
+    """Build the query-generation prompt from the examples and schema relevant to the command"""
+    intents = classify_intents(command)
+    tail = f'\nCollection: {collection_name}\nCommand: "{command}"\n'
+    remaining = token_budget - estimate_tokens(PROMPT_HEADER) - estimate_tokens(tail)
+
+    # Schema fragments get up to a third of what is left; examples take the rest
+    schema = _schema_fragment(command, schema_hint, max(0, remaining // 3))
+    remaining -= estimate_tokens(schema)
+    examples = _example_block(tuple(intents), max(0, remaining))
+
+    parts = [PROMPT_HEADER]
+    if examples:
+        parts.append("# Examples:\n\n" + examples + "\n")
+    if schema:
+        parts.append(f"Fields of {collection_name} (only use these names):\n{schema}\n")
+    parts.append(tail)
+    prompt = "\n".join(parts)
+
+    entry = {
+        "intents": intents,
+        "examples": examples.count("Command:"),
+        "schema_lines": len(schema.splitlines()) if schema else 0,
+        "tokens": estimate_tokens(prompt),
+        "full_template_tokens": FULL_TEMPLATE_TOKENS + estimate_tokens(tail + schema_hint)
+    }
+    prompt_stats.record(entry)
+    logger.info(
+        "query prompt: intents=%s examples=%d tokens=%d (full template %d)",
+        ",".join(intents), entry["examples"], entry["tokens"], entry["full_template_tokens"]
+    )
+    return prompt
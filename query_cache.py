@@ -0,0 +1,213 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import streamlit as st
+from bson import json_util
+
+# Numeric literals in a prompt become positional parameters ("#0", "#1", ...)
+NUMBER_PATTERN = re.compile(r'(?<![\w.])\d+(?:\.\d+)?(?![\w.])')
+PARAM_KEY = "__param__"
+
+
+def normalize_prompt(prompt: str):
+    """Normalize case/whitespace and lift numeric literals out as parameters"""
+    text = " ".join(prompt.lower().split())
+    params = []
+
+    def _lift(match):
+        params.append(match.group(0))
+        return f"#{len(params) - 1}"
+
+    return NUMBER_PATTERN.sub(_lift, text), text, params
+
+
+def schema_version(fields) -> str:
+    """Short, stable stamp for a collection's schema description"""
+    payload = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def _parse_number(literal: str):
+    return float(literal) if "." in literal else int(literal)
+
+
+def _templatize(value, params, found):
+    """Replace values that came from prompt literals with parameter markers"""
+    if isinstance(value, dict):
+        return {k: _templatize(v, params, found) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_templatize(v, params, found) for v in value]
+    if isinstance(value, bool):
+        return value
+    for idx, literal in enumerate(params):
+        if isinstance(value, (int, float)) and value == _parse_number(literal):
+            found.add(idx)
+            return {PARAM_KEY: idx}
+        if isinstance(value, str) and value == literal:
+            found.add(idx)
+            return {PARAM_KEY: idx, "as": "str"}
+    return value
+
+
+def _templatize_query(query, params, found):
+    """Parameterize only scalars inside filters: query/filter documents and $match stages.
+
+    Sort directions, projection flags, limits and update values keep their
+    generated literals, so a later prompt's number never lands in them.
+    """
+    if not isinstance(query, dict):
+        return query
+    template = dict(query)
+    for key in ("query", "filter"):
+        if isinstance(template.get(key), dict):
+            template[key] = _templatize(template[key], params, found)
+    if isinstance(template.get("pipeline"), list):
+        template["pipeline"] = [
+            {**stage, "$match": _templatize(stage["$match"], params, found)}
+            if isinstance(stage, dict) and isinstance(stage.get("$match"), dict) else stage
+            for stage in template["pipeline"]
+        ]
+    if isinstance(template.get("operations"), list):
+        template["operations"] = [_templatize_query(op, params, found) for op in template["operations"]]
+    return template
+
+
+def _fill(value, params):
+    """Substitute parameter markers with the literals of the current prompt"""
+    if isinstance(value, dict):
+        if PARAM_KEY in value:
+            literal = params[value[PARAM_KEY]]
+            return literal if value.get("as") == "str" else _parse_number(literal)
+        return {k: _fill(v, params) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, params) for v in value]
+    return value
+
+
+class QueryCache:
+    """Disk-backed LRU cache of generated queries shared by every worker process"""
+
+    def __init__(self, path, max_entries=5000, max_bytes=50 * 1024 * 1024, max_age=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                collection TEXT,
+                schema_version TEXT,
+                template TEXT,
+                size INTEGER,
+                created REAL,
+                last_access REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+
+    @staticmethod
+    def _key(prompt_key, collection_name, version):
+        raw = json.dumps([prompt_key, collection_name, version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _bump(self, name):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def get(self, prompt: str, collection_name: str, version: str = ""):
+        """Return a cached query for an equivalent prompt, or None"""
+        parameterized, literal, params = normalize_prompt(prompt)
+        now = time.time()
+        with self._lock:
+            for prompt_key in (parameterized, literal):
+                key = self._key(prompt_key, collection_name, version)
+                row = self._conn.execute(
+                    "SELECT template, created FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    continue
+                if now - row[1] > self.max_age:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    continue
+                self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+                self._bump("hits")
+                return _fill(json_util.loads(row[0]), params)
+            self._bump("misses")
+        return None
+
+    def put(self, prompt: str, collection_name: str, query: dict, version: str = ""):
+        """Store a generated query, parameterized on the prompt's numeric literals when safe"""
+        parameterized, literal, params = normalize_prompt(prompt)
+        found = set()
+        template = _templatize_query(query, params, found)
+        # Only share an entry across literal values when every literal maps unambiguously
+        if params and len(set(params)) == len(params) and found == set(range(len(params))):
+            prompt_key = parameterized
+        else:
+            prompt_key, template = literal, query
+        # Extended JSON keeps ObjectId and datetime values intact across the round trip
+        payload = json_util.dumps(template)
+        key = self._key(prompt_key, collection_name, version)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, collection_name, version, payload, len(payload), now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM entries WHERE created < ?", (now - self.max_age,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size, shared across processes"""
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "entries": count,
+            "bytes": total
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM counters")
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_cache():
+    """Process-wide handle on the persistent query cache"""
+    data_dir = os.getenv("APP_DATA_DIR", ".app_data")
+    return QueryCache(
+        os.path.join(data_dir, "query_cache.sqlite3"),
+        max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "5000")),
+        max_bytes=int(os.getenv("QUERY_CACHE_MAX_BYTES", str(50 * 1024 * 1024))),
+        max_age=int(os.getenv("QUERY_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+    )
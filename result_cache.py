@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import bson
+from bson import json_util
+import streamlit as st
+from mongo_utils import get_database_name, get_mongo_client
+
+CACHEABLE_OPERATIONS = {"find", "count", "aggregate"}
+WRITE_STAGES = {"$out", "$merge"}
+# Stages that read other collections, whose writes don't bump this entry's generation
+JOIN_STAGES = {"$lookup", "$graphLookup", "$unionWith"}
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "60"))
+RESULT_CACHE_AGGREGATE_TTL = int(os.getenv("RESULT_CACHE_AGGREGATE_TTL", "300"))
+
+
+def cache_key(query: dict):
+    """(collection, canonical query) with key order and BSON types normalized"""
+    return query.get("collection"), json_util.dumps(query, sort_keys=True)
+
+
+def _uses_stage(value, stages: set) -> bool:
+    """Whether any of `stages` appears in a pipeline, including $facet and $lookup sub-pipelines"""
+    if isinstance(value, dict):
+        return bool(value.keys() & stages) or any(_uses_stage(v, stages) for v in value.values())
+    if isinstance(value, list):
+        return any(_uses_stage(v, stages) for v in value)
+    return False
+
+
+def is_cacheable(query: dict) -> bool:
+    operation = query.get("operation", "").lower()
+    if operation not in CACHEABLE_OPERATIONS or not query.get("collection"):
+        return False
+    pipeline = query.get("pipeline", []) if operation == "aggregate" else []
+    return not _uses_stage(pipeline, WRITE_STAGES | JOIN_STAGES)
+
+
+def output_collections(pipeline: list) -> list:
+    """Collections a pipeline's $out/$merge stage writes to"""
+    names = []
+    for stage in pipeline:
+        if not isinstance(stage, dict):
+            continue
+        target = stage.get("$out", stage.get("$merge"))
+        if isinstance(target, dict):
+            target = target.get("into", target.get("coll"))
+        if isinstance(target, dict):
+            target = target.get("coll")
+        if isinstance(target, str):
+            names.append(target)
+    return names
+
+
+def default_ttl(query: dict) -> int:
+    """Aggregations back dashboards that repeat them; plain reads go stale sooner"""
+    return RESULT_CACHE_AGGREGATE_TTL if query.get("operation") == "aggregate" else RESULT_CACHE_TTL
+
+
+class ResultCache:
+    """Memory-bounded LRU of query results, invalidated by per-collection write generations.
+
+    Results are stored BSON-encoded, which both measures their size and hands
+    every hit a fresh copy that callers may mutate freely.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires, generation, size, is_list, payload)
+        self._generations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.watch_status = "off"
+        self.hits = self.misses = self.invalidations = 0
+
+    def generation(self, collection_name: str) -> int:
+        return self._generations.get(collection_name, 0)
+
+    def bump(self, *collection_names):
+        """Mark collections as written; cached results read before this are stale"""
+        with self._lock:
+            for name in collection_names:
+                if name:
+                    self._generations[name] = self._generations.get(name, 0) + 1
+                    self.invalidations += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, generation, size, is_list, payload = entry
+                if expires > time.time() and generation == self.generation(key[0]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return [bson.decode(doc) for doc in payload] if is_list else bson.decode(payload)
+                self._drop(key)
+            self.misses += 1
+        return None
+
+    def put(self, key, result, ttl: int, generation: int):
+        """Store a result read at `generation`; a write since then makes it a miss"""
+        is_list = isinstance(result, list)
+        try:
+            payload = [bson.encode(doc) for doc in result] if is_list else bson.encode(result)
+        except Exception:
+            return
+        size = sum(map(len, payload)) if is_list else len(payload)
+        if size > self.max_bytes or ttl <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time() + ttl, generation, size, is_list, payload)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key)[2]
+
+    def watch(self, db):
+        """Bump generations for writes made outside this app; needs a replica set"""
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(db,), name="result-cache-watch", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, db):
+        try:
+            with db.watch([{"$project": {"ns": 1, "operationType": 1}}]) as stream:
+                self.watch_status = "watching"
+                for change in stream:
+                    collection_name = change.get("ns", {}).get("coll")
+                    if collection_name:
+                        self.bump(collection_name)
+                    else:
+                        # dropDatabase and invalidate events don't name a collection
+                        self.clear()
+        except Exception as e:
+            self.watch_status = f"stopped: {str(e)}"
+        self._watcher = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / (self.hits + self.misses), 3) if self.hits + self.misses else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "invalidations": self.invalidations,
+                "change_stream": self.watch_status
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    """Process-wide result cache, optionally following a change stream"""
+    cache = ResultCache(max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+    if os.getenv("RESULT_CACHE_CHANGE_STREAMS", "0") == "1":
+        cache.watch(get_mongo_client()[get_database_name()])
+    return cache
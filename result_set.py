@@ -0,0 +1,195 @@
+import os
+from pymongo.errors import ExecutionTimeout
+from init_db import get_collection
+
+PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "50"))
+MAX_RESULT_DOCS = int(os.getenv("MAX_RESULT_DOCS", "1000"))
+COUNT_CAP = int(os.getenv("RESULT_COUNT_CAP", "100000"))
+COUNT_TIMEOUT_MS = int(os.getenv("RESULT_COUNT_TIMEOUT_MS", "2000"))
+
+
+def _sort_key(sort):
+    """First key of a generated sort spec as (field, direction), defaulting to _id"""
+    if isinstance(sort, dict) and sort:
+        field, direction = next(iter(sort.items()))
+    elif isinstance(sort, list) and sort:
+        field, direction = sort[0] if isinstance(sort[0], (list, tuple)) else (sort[0], 1)
+    else:
+        return "_id", 1
+    return field, -1 if direction in (-1, "desc", "descending") else 1
+
+
+class ResultSet:
+    """Lazily paged view over a find query using keyset pagination on _id or the sort key.
+
+    Only the page anchors are kept between reruns; every page is a short,
+    bounded query, so no server-side cursor outlives a script run. Keyset
+    paging on a sort key assumes the key holds a single BSON type, apart
+    from null or missing values.
+    """
+
+    def __init__(self, collection_name, filter=None, projection=None, sort=None,
+                 limit=0, page_size=PAGE_SIZE):
+        self.collection_name = collection_name
+        self.filter = filter or {}
+        self.limit = limit if isinstance(limit, int) and limit > 0 else 0
+        self.page_size = page_size
+        self.sort_field, self.sort_dir = _sort_key(sort)
+        self.projection, self._hidden = self._anchor_projection(projection or {})
+        self.page = 0
+        self._anchors = [None]  # _anchors[n] = (sort value, _id) of the last doc on page n-1
+        self._last_page = None
+        self._cached = None
+        self._total = None
+
+    def _anchor_projection(self, projection):
+        """Make sure _id and the sort field come back; remember which ones to hide"""
+        if not projection:
+            return None, set()
+        projection = dict(projection)
+        hidden = set()
+        inclusive = any(v for k, v in projection.items() if k != "_id")
+        for field in {"_id", self.sort_field}:
+            if inclusive and field != "_id" and not projection.get(field):
+                projection[field] = 1
+                hidden.add(field)
+            elif not inclusive and field in projection and not projection[field]:
+                del projection[field]
+                hidden.add(field)
+            elif field == "_id" and projection.get("_id") == 0:
+                del projection["_id"]
+                hidden.add("_id")
+        return projection or None, hidden
+
+    def _page_filter(self, anchor):
+        if anchor is None:
+            return self.filter
+        value, last_id = anchor
+        op = "$gt" if self.sort_dir == 1 else "$lt"
+        if self.sort_field == "_id":
+            after = {"_id": {op: last_id}}
+        elif value is None:
+            # Null and missing sort keys compare equal and come first ascending, last descending
+            after = {"$or": [{self.sort_field: None, "_id": {op: last_id}}]}
+            if self.sort_dir == 1:
+                after["$or"].append({self.sort_field: {"$ne": None}})
+        else:
+            after = {"$or": [
+                {self.sort_field: {op: value}},
+                {self.sort_field: value, "_id": {op: last_id}}
+            ]}
+            if self.sort_dir == -1:
+                # Range bounds never match null or missing keys, which follow every value
+                after["$or"].append({self.sort_field: None})
+        return {"$and": [self.filter, after]} if self.filter else after
+
+    def _sort_spec(self):
+        if self.sort_field == "_id":
+            return [("_id", self.sort_dir)]
+        return [(self.sort_field, self.sort_dir), ("_id", self.sort_dir)]
+
+    def _query_page(self, page):
+        collection = get_collection(self.collection_name)
+        if collection is None:
+            raise RuntimeError("Collection not found")
+        size = self.page_size
+        if self.limit:
+            size = max(0, min(size, self.limit - page * self.page_size))
+        if size == 0:
+            return [], False
+        anchor = self._anchors[page]
+        cursor = collection.find(self._page_filter(anchor), self.projection).sort(self._sort_spec())
+        docs = list(cursor.limit(size + 1).batch_size(size + 1))
+        has_next = len(docs) > size
+        if self.limit and (page + 1) * self.page_size >= self.limit:
+            has_next = False
+        return docs[:size], has_next
+
+    def _anchor_of(self, doc):
+        value = doc.get("_id") if self.sort_field == "_id" else doc.get(self.sort_field)
+        return value, doc.get("_id")
+
+    def fetch(self, page=None):
+        """Documents on the requested page (defaults to the current page)"""
+        page = self.page if page is None else page
+        if self._cached and self._cached[0] == page:
+            return self._cached[1]
+        # Walk forward from the furthest known anchor
+        while len(self._anchors) <= page:
+            docs, has_next = self._query_page(len(self._anchors) - 1)
+            if not has_next:
+                self._last_page = len(self._anchors) - 1
+                page = self._last_page
+                break
+            self._anchors.append(self._anchor_of(docs[-1]))
+        docs, has_next = self._query_page(page)
+        if has_next and len(self._anchors) == page + 1:
+            self._anchors.append(self._anchor_of(docs[-1]))
+        elif not has_next:
+            self._last_page = page
+        self.page = page
+        visible = [{k: v for k, v in doc.items() if k not in self._hidden} for doc in docs]
+        self._cached = (page, visible)
+        return visible
+
+    def has_next(self):
+        return self._last_page is None or self.page < self._last_page
+
+    def next_page(self):
+        if self.has_next():
+            self.page += 1
+
+    def previous_page(self):
+        self.page = max(0, self.page - 1)
+
+    def estimate_total(self):
+        """Cheap document count as (count, exact)"""
+        if self._total is None:
+            collection = get_collection(self.collection_name)
+            if collection is None:
+                return 0, False
+            if not self.filter:
+                self._total = (collection.estimated_document_count(), False)
+            else:
+                try:
+                    count = collection.count_documents(self.filter, limit=COUNT_CAP, maxTimeMS=COUNT_TIMEOUT_MS)
+                except ExecutionTimeout:
+                    count = COUNT_CAP
+                self._total = (count, count < COUNT_CAP)
+            if self.limit and self._total[0] >= self.limit:
+                self._total = (self.limit, True)
+        return self._total
+
+    def page_count(self):
+        total, exact = self.estimate_total()
+        return max(1, -(-total // self.page_size)), exact
+
+
+def open_result_set(query: dict):
+    """ResultSet for a generated find query, or None for other operations"""
+    if str(query.get("operation", "")).lower() != "find":
+        return None
+    return ResultSet(
+        query["collection"],
+        filter=query.get("query", {}),
+        projection=query.get("projection", {"_id": 0}),
+        sort=query.get("sort"),
+        limit=query.get("limit", 0)
+    )
+
+
+def cap_limit(limit, cap: int = MAX_RESULT_DOCS) -> int:
+    """A find limit no larger than `cap`; missing, zero or negative limits mean `cap`"""
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0 or limit > cap:
+        return cap
+    return limit
+
+
+def cap_pipeline(pipeline: list, limit: int = MAX_RESULT_DOCS) -> list:
+    """Append a $limit to a read pipeline so it cannot return an unbounded result"""
+    if any(isinstance(stage, dict) and ("$out" in stage or "$merge" in stage) for stage in pipeline):
+        return pipeline
+    last = pipeline[-1] if pipeline else None
+    if isinstance(last, dict) and isinstance(last.get("$limit"), int) and last["$limit"] <= limit:
+        return list(pipeline)
+    return list(pipeline) + [{"$limit": limit}]
@@ -0,0 +1,229 @@
+import os
+import copy
+import time
+import hashlib
+import threading
+from collections import Counter
+from datetime import datetime
+import streamlit as st
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from mongo_utils import get_database_name, get_mongo_client
+
+SCHEMA_SAMPLE_SIZE = int(os.getenv("SCHEMA_SAMPLE_SIZE", "500"))
+SCHEMA_TTL = int(os.getenv("SCHEMA_TTL", "600"))
+SCHEMA_MAX_TIME_MS = int(os.getenv("SCHEMA_MAX_TIME_MS", "2000"))
+SCHEMA_FULL_REFRESH_EVERY = int(os.getenv("SCHEMA_FULL_REFRESH_EVERY", "6"))
+CARDINALITY_CAP = 1000
+HASHABLE_TYPES = {"bool", "int", "long", "double", "string", "objectId", "date"}
+
+
+def bson_type(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if -2**31 <= value < 2**31 else "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, Decimal128):
+        return "decimal"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+
+class FieldStats:
+    def __init__(self):
+        self.present = 0
+        self.nulls = 0
+        self.types = Counter()
+        self.values = set()
+        self.values_capped = False
+
+    def add(self, value):
+        self.present += 1
+        kind = bson_type(value)
+        self.types[kind] += 1
+        if value is None:
+            self.nulls += 1
+        elif kind not in ("array", "object") and not self.values_capped:
+            self.values.add(value if kind in HASHABLE_TYPES else repr(value))
+            self.values_capped = len(self.values) >= CARDINALITY_CAP
+
+
+class CollectionSchema:
+    """Field paths, BSON types, null ratios and approximate cardinality from sampled documents"""
+
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+        self.fields = {}
+        self.sampled = 0
+        self.total_estimate = 0
+        self.max_id = None
+        self.refreshed_at = 0.0
+        self.refreshes = 0
+        self.version = ""
+
+    def _walk(self, doc, prefix=""):
+        for key, value in doc.items():
+            path = f"{prefix}{key}"
+            self.fields.setdefault(path, FieldStats()).add(value)
+            if isinstance(value, dict):
+                self._walk(value, f"{path}.")
+            elif isinstance(value, list):
+                # Array elements share the parent path, as in MongoDB query paths
+                for item in value[:20]:
+                    if isinstance(item, dict):
+                        self._walk(item, f"{path}.")
+                    else:
+                        self.fields.setdefault(f"{path}[]", FieldStats()).add(item)
+
+    def merge(self, docs):
+        for doc in docs:
+            self.sampled += 1
+            self._walk(doc)
+            doc_id = doc.get("_id")
+            if isinstance(doc_id, ObjectId) and (self.max_id is None or doc_id > self.max_id):
+                self.max_id = doc_id
+        shape = sorted((path, sorted(stats.types)) for path, stats in self.fields.items())
+        self.version = hashlib.sha1(repr(shape).encode("utf-8")).hexdigest()[:12]
+        self.refreshed_at = time.time()
+
+    def summary(self) -> list:
+        rows = []
+        for path, stats in sorted(self.fields.items()):
+            non_null = stats.present - stats.nulls
+            distinct = len(stats.values)
+            if stats.values_capped or (non_null and distinct / non_null > 0.9 and self.sampled < self.total_estimate):
+                cardinality = f">{distinct}" if stats.values_capped else "~unique"
+            else:
+                cardinality = str(distinct)
+            rows.append({
+                "field": path,
+                "types": ", ".join(kind for kind, _ in stats.types.most_common()),
+                "null_ratio": round(max(0.0, 1 - non_null / self.sampled), 3) if self.sampled else 0.0,
+                "cardinality": cardinality
+            })
+        return rows
+
+    def field_names(self) -> list:
+        return [path for path in sorted(self.fields) if not path.endswith("[]")]
+
+    def boolean_fields(self) -> set:
+        return {path for path, stats in self.fields.items() if set(stats.types) - {"null"} == {"bool"}}
+
+    def compact(self) -> str:
+        """One-line-per-field schema for prompts"""
+        lines = []
+        for row in self.summary():
+            if row["field"].endswith("[]"):
+                continue
+            note = f" ({round(row['null_ratio'] * 100)}% missing)" if row["null_ratio"] >= 0.05 else ""
+            lines.append(f"- {row['field']}: {row['types']}{note}")
+        return "\n".join(lines)
+
+
+class SchemaCatalog:
+    """Per-collection schema cache with a TTL and incremental refresh.
+
+    Incremental refreshes only see documents added since the last sample, so
+    every `full_every`-th refresh, and any refresh after the collection
+    shrank, resamples from scratch to drop removed or retyped fields.
+    Sampling holds only that collection's lock; a refresh is built on a copy
+    and swapped in, so lookups never wait on another collection's $sample.
+    """
+
+    def __init__(self, sample_size=SCHEMA_SAMPLE_SIZE, ttl=SCHEMA_TTL, max_time_ms=SCHEMA_MAX_TIME_MS,
+                 full_every=SCHEMA_FULL_REFRESH_EVERY):
+        self.sample_size = sample_size
+        self.ttl = ttl
+        self.max_time_ms = max_time_ms
+        self.full_every = full_every
+        self._schemas = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _sample(self, collection, match=None):
+        pipeline = [{"$match": match}] if match else []
+        pipeline.append({"$sample": {"size": self.sample_size}})
+        return collection.aggregate(pipeline, maxTimeMS=self.max_time_ms)
+
+    def _fresh(self, collection_name: str):
+        with self._lock:
+            schema = self._schemas.get(collection_name)
+            if schema and time.time() - schema.refreshed_at < self.ttl:
+                return schema
+            return None
+
+    def get(self, collection_name: str) -> CollectionSchema:
+        schema = self._fresh(collection_name)
+        if schema is not None:
+            return schema
+        with self._lock:
+            collection_lock = self._locks.setdefault(collection_name, threading.Lock())
+        with collection_lock:
+            # Another thread may have refreshed it while this one waited
+            schema = self._fresh(collection_name)
+            if schema is not None:
+                return schema
+            with self._lock:
+                previous = self._schemas.get(collection_name)
+            collection = get_mongo_client()[get_database_name()][collection_name]
+            total_estimate = collection.estimated_document_count()
+            incremental = (previous is not None and previous.max_id is not None
+                           and previous.refreshes + 1 < self.full_every
+                           and total_estimate >= previous.total_estimate)
+            if incremental:
+                # Only documents added since the last sample are new information
+                schema = copy.deepcopy(previous)
+                schema.merge(self._sample(collection, {"_id": {"$gt": previous.max_id}}))
+                schema.refreshes += 1
+            else:
+                schema = CollectionSchema(collection_name)
+                schema.merge(self._sample(collection))
+            schema.total_estimate = total_estimate
+            with self._lock:
+                self._schemas[collection_name] = schema
+            return schema
+
+    def mark_stale(self, collection_name: str):
+        """Refresh a collection on its next lookup, incrementally when possible.
+
+        The version only moves when the refresh sees a new field or type, so
+        a write that keeps the schema keeps cached translations valid.
+        """
+        with self._lock:
+            schema = self._schemas.get(collection_name)
+            if schema is not None:
+                schema.refreshed_at = 0.0
+
+    def invalidate(self, collection_name: str = None):
+        with self._lock:
+            if collection_name is None:
+                self._schemas.clear()
+            else:
+                self._schemas.pop(collection_name, None)
+
+
+@st.cache_resource(show_spinner=False)
+def get_schema_catalog():
+    return SchemaCatalog()
+
+
+def get_collection_schema(collection_name: str):
+    """Cached schema for a collection, or None when it cannot be inferred"""
+    try:
+        schema = get_schema_catalog().get(collection_name)
+    except Exception:
+        return None
+    return schema if schema.fields else None
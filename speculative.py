@@ -0,0 +1,80 @@
+import os
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+from result_set import cap_limit, cap_pipeline
+
+READ_OPERATIONS = {"find", "count", "aggregate"}
+WRITE_STAGES = {"$out", "$merge"}
+
+
+def is_side_effect_free(query: dict) -> bool:
+    """True for validated reads that cannot modify the database"""
+    operation = str(query.get("operation", "")).lower()
+    if operation not in READ_OPERATIONS:
+        return False
+    if operation == "aggregate":
+        pipeline = query.get("pipeline", [])
+        if not isinstance(pipeline, list):
+            return False
+        for stage in pipeline:
+            if not isinstance(stage, dict) or WRITE_STAGES.intersection(stage):
+                return False
+    return True
+
+
+def bound_query(query: dict) -> dict:
+    """Copy of a read query with the bounds normal execution applies, so a used prediction matches it"""
+    bounded = copy.deepcopy(query)
+    operation = str(bounded.get("operation", "")).lower()
+    if operation == "find":
+        bounded["limit"] = cap_limit(bounded.get("limit", 100))
+    elif operation == "aggregate":
+        bounded["pipeline"] = cap_pipeline(bounded.get("pipeline", []))
+    return bounded
+
+
+@st.cache_resource(show_spinner=False)
+def get_worker_pool():
+    """Process-wide pool for work that overlaps with LLM round trips"""
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("SPECULATIVE_WORKERS", "4")),
+        thread_name_prefix="speculative"
+    )
+
+
+def with_script_context(fn):
+    """Wrap fn so it runs with the calling script's Streamlit context attached"""
+    ctx = get_script_run_ctx()
+
+    def run(*args, **kwargs):
+        if ctx is None:
+            return fn(*args, **kwargs)
+        thread = threading.current_thread()
+        previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+        add_script_run_ctx(thread, ctx)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            # Pool threads outlive the task; don't leave this run's context on them
+            if previous is None:
+                delattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME)
+            else:
+                setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+
+    return run
+
+
+def submit_with_context(fn, *args, **kwargs):
+    """Run fn on the worker pool with the current Streamlit script context attached"""
+    return get_worker_pool().submit(with_script_context(fn), *args, **kwargs)
+
+
+def start_speculative_read(execute, query: dict):
+    """Start a bounded read of a side-effect-free query; returns a Future or None"""
+    if not is_side_effect_free(query):
+        return None
+    return submit_with_context(execute, bound_query(query))
@@ -0,0 +1,219 @@
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from bson.int64 import Int64
+
+IDENTIFIER_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$.")
+NUMBER_CHARS = set("0123456789+-.eE")
+LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def _parse_date(value):
+    if isinstance(value, dict) and "$numberLong" in value:
+        value = int(value["$numberLong"])
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    raise ValueError(f"Unsupported date value: {value!r}")
+
+
+# Single-key Extended JSON wrappers; query operators such as $regex are left alone
+EXTENDED_TYPES = {
+    "$oid": ObjectId,
+    "$date": _parse_date,
+    "$numberLong": lambda value: Int64(int(value)),
+    "$numberInt": int,
+    "$numberDouble": float,
+    "$numberDecimal": lambda value: Decimal128(str(value)),
+}
+
+# mongosh constructors the model sometimes writes instead of Extended JSON
+CONSTRUCTORS = {
+    "ObjectId": ObjectId,
+    "ISODate": _parse_date,
+    "Date": _parse_date,
+    "NumberLong": lambda value: Int64(int(value)),
+    "NumberInt": int,
+    "NumberDecimal": lambda value: Decimal128(str(value)),
+}
+
+
+class _Parser:
+    """Recursive-descent reader for the JSON dialect LLMs write.
+
+    Accepts single-quoted strings, unquoted keys, trailing commas, comments,
+    Python literals, mongosh constructors and Extended JSON wrappers, all in
+    one pass over the text; quoted values are never rewritten.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def error(self, message):
+        snippet = self.text[max(0, self.pos - 20):self.pos + 20]
+        return ValueError(f"{message} at position {self.pos} near {snippet!r}")
+
+    def skip(self):
+        text, n = self.text, len(self.text)
+        while self.pos < n:
+            char = text[self.pos]
+            if char in " \t\r\n":
+                self.pos += 1
+            elif text.startswith("//", self.pos):
+                end = text.find("\n", self.pos)
+                self.pos = n if end < 0 else end + 1
+            elif text.startswith("/*", self.pos):
+                end = text.find("*/", self.pos + 2)
+                self.pos = n if end < 0 else end + 2
+            else:
+                break
+
+    def peek(self):
+        self.skip()
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def value(self):
+        char = self.peek()
+        if char == "{":
+            return self.object()
+        if char == "[":
+            return self.array()
+        if char in "\"'":
+            return self.string()
+        if char in NUMBER_CHARS:
+            return self.number()
+        if char in IDENTIFIER_CHARS:
+            return self.word()
+        raise self.error("Unexpected character" if char else "Unexpected end of input")
+
+    def object(self):
+        self.pos += 1
+        result = {}
+        while True:
+            char = self.peek()
+            if char == "}":
+                self.pos += 1
+                break
+            if char in "\"'":
+                key = self.string()
+            elif char and char in IDENTIFIER_CHARS:
+                key = self.identifier()
+            else:
+                raise self.error("Expected a key")
+            if self.peek() != ":":
+                raise self.error("Expected ':'")
+            self.pos += 1
+            result[key] = self.value()
+            char = self.peek()
+            if char == ",":
+                self.pos += 1
+            elif char != "}":
+                raise self.error("Expected ',' or '}'")
+        if len(result) == 1:
+            key, value = next(iter(result.items()))
+            if key in EXTENDED_TYPES:
+                return EXTENDED_TYPES[key](value)
+        return result
+
+    def array(self):
+        self.pos += 1
+        result = []
+        while True:
+            char = self.peek()
+            if char == "]":
+                self.pos += 1
+                return result
+            result.append(self.value())
+            char = self.peek()
+            if char == ",":
+                self.pos += 1
+            elif char != "]":
+                raise self.error("Expected ',' or ']'")
+
+    def string(self):
+        quote = self.text[self.pos]
+        self.pos += 1
+        parts = []
+        text, n = self.text, len(self.text)
+        start = self.pos
+        while self.pos < n:
+            char = text[self.pos]
+            if char == quote:
+                parts.append(text[start:self.pos])
+                self.pos += 1
+                return "".join(parts)
+            if char == "\\":
+                parts.append(text[start:self.pos])
+                escape = text[self.pos + 1:self.pos + 2]
+                if escape == "u":
+                    parts.append(chr(int(text[self.pos + 2:self.pos + 6], 16)))
+                    self.pos += 6
+                else:
+                    parts.append(ESCAPES.get(escape, escape))
+                    self.pos += 2
+                start = self.pos
+                continue
+            self.pos += 1
+        raise self.error("Unterminated string")
+
+    def number(self):
+        start = self.pos
+        while self.pos < len(self.text) and self.text[self.pos] in NUMBER_CHARS:
+            self.pos += 1
+        literal = self.text[start:self.pos]
+        try:
+            if any(c in literal for c in ".eE"):
+                return float(literal)
+            return int(literal)
+        except ValueError:
+            self.pos = start
+            raise self.error(f"Invalid number {literal!r}")
+
+    def identifier(self):
+        start = self.pos
+        while self.pos < len(self.text) and self.text[self.pos] in IDENTIFIER_CHARS:
+            self.pos += 1
+        return self.text[start:self.pos]
+
+    def word(self):
+        start = self.pos
+        name = self.identifier()
+        if name == "new":
+            self.skip()
+            name = self.identifier()
+        if name in LITERALS:
+            return LITERALS[name]
+        if name in CONSTRUCTORS and self.peek() == "(":
+            self.pos += 1
+            argument = None if self.peek() == ")" else self.value()
+            if self.peek() != ")":
+                raise self.error("Expected ')'")
+            self.pos += 1
+            if argument is None:
+                return ObjectId() if name == "ObjectId" else datetime.now(timezone.utc)
+            return CONSTRUCTORS[name](argument)
+        self.pos = start
+        raise self.error(f"Unexpected identifier {name!r}")
+
+
+def parse_json_value(text: str):
+    """Parse one complete JSON value, e.g. a sub-object the model sent as a string"""
+    parser = _Parser(text)
+    value = parser.value()
+    if parser.peek():
+        raise parser.error("Unexpected trailing text")
+    return value
+
+
+def parse_json_text(text: str):
+    """Parse the first JSON object in model output: prose and code fences are skipped"""
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("No JSON object found in response")
+    parser = _Parser(text)
+    parser.pos = start
+    return parser.object()
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from pymongo import DeleteMany, InsertOne, ReplaceOne, UpdateMany
+from pymongo.errors import PyMongoError
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+from mongo_utils import get_database_name, get_mongo_client
+
+
+def to_write_model(op: dict):
+    """Map a generated write operation onto a pymongo bulk write model"""
+    op_type = op.get("operation")
+    if op_type == "insert":
+        return InsertOne(op["document"])
+    if op_type == "update":
+        return UpdateMany(op["filter"], op["update"])
+    if op_type == "delete":
+        return DeleteMany(op.get("filter", op.get("query", {})))
+    if op_type == "replace":
+        return ReplaceOne(op["filter"], op["replacement"])
+    raise ValueError(f"Unsupported operation in transaction: {op_type}")
+
+
+def group_by_collection(operations: list, default_collection=None):
+    """Group operations per collection, keeping their relative order"""
+    groups = OrderedDict()
+    for index, op in enumerate(operations):
+        collection_name = op.get("collection") or default_collection
+        if not collection_name:
+            raise ValueError(f"Operation {index} does not name a collection")
+        groups.setdefault(collection_name, []).append((index, op, to_write_model(op)))
+    return groups
+
+
+def execute_transaction(operations: list, default_collection=None):
+    """Run write operations atomically as one bulk_write per collection inside a transaction"""
+    if not operations:
+        return {"error": "No operations provided"}
+    try:
+        groups = group_by_collection(operations, default_collection)
+    except (KeyError, ValueError) as e:
+        return {"error": f"Invalid transaction: {str(e)}"}
+
+    client = get_mongo_client()
+    db = client[get_database_name()]
+
+    def run(session):
+        return {
+            name: db[name].bulk_write([model for _, _, model in items], ordered=True, session=session)
+            for name, items in groups.items()
+        }
+
+    try:
+        # with_transaction retries transient and commit-unknown errors until its
+        # own time limit; running the callback again after that could apply a
+        # commit that already landed a second time
+        with client.start_session() as session:
+            batch_results = session.with_transaction(
+                run,
+                read_concern=ReadConcern("snapshot"),
+                write_concern=WriteConcern("majority")
+            )
+    except PyMongoError as e:
+        if e.has_error_label("UnknownTransactionCommitResult"):
+            return {"error": f"Transaction outcome is uncertain: the commit may or may not have been applied. "
+                             f"Check the data before retrying. ({str(e)})"}
+        return {"error": f"Transaction failed: {str(e)}"}
+
+    results = [None] * len(operations)
+    for name, items in groups.items():
+        for index, op, model in items:
+            entry = {"index": index, "operation": op["operation"], "collection": name, "status": "committed"}
+            if isinstance(model, InsertOne):
+                # bulk_write assigns _id on the document passed to InsertOne
+                entry["inserted_id"] = str(op["document"].get("_id"))
+            results[index] = entry
+    return {
+        "status": "committed",
+        "operations": results,
+        "collections": {
+            name: {
+                "inserted": result.inserted_count,
+                "matched": result.matched_count,
+                "modified": result.modified_count,
+                "deleted": result.deleted_count,
+                "upserted": result.upserted_count
+            }
+            for name, result in batch_results.items()
+        }
+    }